@@ -6,14 +6,22 @@
   路径3: Idea → Paper → Pattern (相似Paper召回)
 """
 
-import json
-from collections import defaultdict
+import os
+import pickle
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List
 
 import networkx as nx
 import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+
+# 导入pipeline工具函数
+sys.path.insert(0, str(Path(__file__).parent))
+from pipeline.utils import dumps_json, load_json
 
 # ===================== 配置 =====================
 SCRIPT_DIR = Path(__file__).parent
@@ -31,6 +39,14 @@ NODES_REVIEW = OUTPUT_DIR / "nodes_review.json"  # 新增：Review 节点
 EDGES_FILE = OUTPUT_DIR / "edges.json"
 GRAPH_FILE = OUTPUT_DIR / "knowledge_graph_v2.gpickle"
 
+# 分词: 小写后按 \b\w+\b 切分
+_TOKEN_RE = re.compile(r'\b\w+\b')
+
+
+def _tokenize(text: str) -> List[str]:
+    """将文本切分为小写词列表"""
+    return _TOKEN_RE.findall(text.lower())
+
 
 @dataclass
 class EdgeStats:
@@ -47,6 +63,9 @@ class EdgeStats:
     # 召回边 - 路径3: Idea → Paper → Pattern
     idea_similar_to_paper: int = 0
 
+    # Review 质量边
+    paper_has_review: int = 0
+
 
 class EdgeBuilder:
     """知识图谱边构建器"""
@@ -54,14 +73,16 @@ class EdgeBuilder:
     def __init__(self):
         self.G = nx.DiGraph()
         self.stats = EdgeStats()
+        # relation -> [(u, v, attrs)]，与写入图的边一致，保存时直接从这里输出
+        self._edge_buffers: Dict[str, List] = {}
 
         # 加载节点数据
         print("📂 加载节点数据...")
-        self.ideas = self._load_json(NODES_IDEA)
-        self.patterns = self._load_json(NODES_PATTERN)
-        self.domains = self._load_json(NODES_DOMAIN)
-        self.papers = self._load_json(NODES_PAPER)
-        self.reviews = self._load_json(NODES_REVIEW) if NODES_REVIEW.exists() else []
+        self.ideas = load_json(NODES_IDEA)
+        self.patterns = load_json(NODES_PATTERN)
+        self.domains = load_json(NODES_DOMAIN)
+        self.papers = load_json(NODES_PAPER)
+        self.reviews = load_json(NODES_REVIEW) if NODES_REVIEW.exists() else []
 
         print(f"  ✓ Idea: {len(self.ideas)} 个")
         print(f"  ✓ Pattern: {len(self.patterns)} 个")
@@ -72,11 +93,6 @@ class EdgeBuilder:
         # 构建映射索引
         self._build_indices()
 
-    def _load_json(self, filepath: Path) -> List[Dict]:
-        """加载 JSON 文件"""
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-
     def _build_indices(self):
         """构建索引映射"""
         print("\n🔍 构建索引映射...")
@@ -94,6 +110,37 @@ class EdgeBuilder:
 
         # Paper: paper_id -> paper
         self.paper_id_to_paper = {p['paper_id']: p for p in self.papers}
+        # Paper: paper_id -> 行号（与 self.papers 顺序一致）
+        self.paper_idx = {p['paper_id']: i for i, p in enumerate(self.papers)}
+        # ---- Paper 列式存储（SoA）：按行号对齐的 NumPy 列 ----
+        self.paper_ids = [p['paper_id'] for p in self.papers]
+        # Paper 质量分数只计算一次，按行号索引
+        self.paper_quality = self._compute_paper_quality(self.papers)
+
+        # Domain: domain_id -> 整数下标（先 nodes_domain 中的 Domain，再追加只出现在 Paper 上的 domain_id）
+        self.domain_ids = [d['domain_id'] for d in self.domains]
+        self.domain_iloc = {domain_id: i for i, domain_id in enumerate(self.domain_ids)}
+        # Paper -> Domain 下标（V3: Paper 有单个 domain_id 字段，无 domain 记为 -1）
+        self.paper_domain_iloc = np.full(len(self.papers), -1, dtype=np.int64)
+        for paper_iloc, paper in enumerate(self.papers):
+            domain_id = paper.get('domain_id', '')
+            if domain_id:
+                if domain_id not in self.domain_iloc:
+                    self.domain_iloc[domain_id] = len(self.domain_ids)
+                    self.domain_ids.append(domain_id)
+                self.paper_domain_iloc[paper_iloc] = self.domain_iloc[domain_id]
+
+        # Paper -> Idea / Pattern 下标（不存在的记为 -1）
+        idea_iloc = {idea['idea_id']: i for i, idea in enumerate(self.ideas)}
+        pattern_iloc = {p['pattern_id']: i for i, p in enumerate(self.patterns)}
+        self.paper_idea_iloc = np.fromiter(
+            (idea_iloc.get(p.get('idea_id', ''), -1) for p in self.papers),
+            dtype=np.int64, count=len(self.papers)
+        )
+        self.paper_pattern_iloc = np.fromiter(
+            (pattern_iloc.get(p.get('pattern_id', ''), -1) for p in self.papers),
+            dtype=np.int64, count=len(self.papers)
+        )
 
         # Review: review_id -> review
         self.review_id_to_review = {r['review_id']: r for r in self.reviews}
@@ -137,40 +184,34 @@ class EdgeBuilder:
         """构建 Paper 的基础连接边"""
         print("\n📄 构建 Paper 基础连接边...")
 
-        for paper in self.papers:
-            paper_id = paper['paper_id']
-            paper_quality = self._get_paper_quality(paper)
-
-            # 1. Paper -[implements]-> Idea
-            idea_id = paper.get('idea_id', '')
-            if idea_id and idea_id in self.idea_id_to_idea:
-                self.G.add_edge(
-                    paper_id,
-                    idea_id,
-                    relation='implements'
-                )
-                self.stats.paper_implements_idea += 1
-
-            # 2. Paper -[uses_pattern]-> Pattern (带质量权重)
-            pattern_id = paper.get('pattern_id', '')
-            if pattern_id and pattern_id in self.pattern_id_to_pattern:
-                self.G.add_edge(
-                    paper_id,
-                    pattern_id,
-                    relation='uses_pattern',
-                    quality=paper_quality
-                )
-                self.stats.paper_uses_pattern += 1
-
-            # 3. Paper -[in_domain]-> Domain
-            domain_id = paper.get('domain_id', '')
-            if domain_id and domain_id in self.domain_id_to_domain:
-                self.G.add_edge(
-                    paper_id,
-                    domain_id,
-                    relation='in_domain'
-                )
-                self.stats.paper_in_domain += 1
+        # 先收集 (u, v, attrs)，再批量写入图；只遍历下标有效的行
+        # 1. Paper -[implements]-> Idea
+        implements_edges = [
+            (self.paper_ids[i], self.ideas[j]['idea_id'], {'relation': 'implements'})
+            for i, j in zip(*self._valid_rows(self.paper_idea_iloc, len(self.ideas)))
+        ]
+
+        # 2. Paper -[uses_pattern]-> Pattern (带质量权重)
+        uses_pattern_edges = [
+            (self.paper_ids[i], self.patterns[j]['pattern_id'], {
+                'relation': 'uses_pattern',
+                'quality': float(self.paper_quality[i])
+            })
+            for i, j in zip(*self._valid_rows(self.paper_pattern_iloc, len(self.patterns)))
+        ]
+
+        # 3. Paper -[in_domain]-> Domain（只连 nodes_domain 中存在的 Domain）
+        in_domain_edges = [
+            (self.paper_ids[i], self.domain_ids[j], {'relation': 'in_domain'})
+            for i, j in zip(*self._valid_rows(self.paper_domain_iloc, len(self.domains)))
+        ]
+
+        self._add_edges('implements', implements_edges)
+        self._add_edges('uses_pattern', uses_pattern_edges)
+        self._add_edges('in_domain', in_domain_edges)
+        self.stats.paper_implements_idea += len(implements_edges)
+        self.stats.paper_uses_pattern += len(uses_pattern_edges)
+        self.stats.paper_in_domain += len(in_domain_edges)
 
         print(f"  ✓ Paper->Idea: {self.stats.paper_implements_idea} 条")
         print(f"  ✓ Paper->Pattern: {self.stats.paper_uses_pattern} 条")
@@ -182,7 +223,7 @@ class EdgeBuilder:
         """构建 Paper -[has_review]-> Review 边，以及 Review -[evaluates]-> Quality 伪节点"""
         print("\n⭐ 构建 Paper <-> Review 边...")
 
-        paper_review_count = 0
+        edges = []
 
         for paper in self.papers:
             paper_id = paper['paper_id']
@@ -199,15 +240,16 @@ class EdgeBuilder:
 
                 score_value = review.get('overall_score_value', 0.5)
 
-                self.G.add_edge(
-                    paper_id,
-                    review_id,
-                    relation='has_review',
-                    score=score_value
-                )
-                paper_review_count += 1
+                edges.append((paper_id, review_id, {
+                    'relation': 'has_review',
+                    'score': score_value
+                }))
 
-        print(f"  ✓ Paper->Review: {paper_review_count} 条")
+        # 按图中新增的边数统计（重复的 (u, v) 只算一次，与保存的图谱一致）
+        num_edges = self.G.number_of_edges()
+        self._add_edges('has_review', edges)
+        self.stats.paper_has_review = self.G.number_of_edges() - num_edges
+        print(f"  ✓ Paper->Review: {len(edges)} 条")
 
     # ===================== 召回边 - 路径2: Idea → Domain → Pattern =====================
 
@@ -218,41 +260,40 @@ class EdgeBuilder:
         """
         print("\n🔗 构建 Idea -[belongs_to]-> Domain 边...")
 
-        for idea in self.ideas:
-            idea_id = idea['idea_id']
-            source_paper_ids = idea.get('source_paper_ids', [])
-
-            if not source_paper_ids:
-                continue
-
-            # 统计每个 Domain 中的 Paper 数量
-            domain_counts = defaultdict(int)
-
-            for paper_id in source_paper_ids:
-                paper = self.paper_id_to_paper.get(paper_id)
-                if not paper:
-                    continue
-
-                # V3: Paper 有 domain_id 字段
-                domain_id = paper.get('domain_id', '')
-                if domain_id:
-                    domain_counts[domain_id] += 1
-
-            # 计算每个 Domain 的权重并创建边
-            total_papers = len(source_paper_ids)
-
-            for domain_id, count in domain_counts.items():
-                weight = count / total_papers  # 占比作为权重
-
-                self.G.add_edge(
-                    idea_id,
-                    domain_id,
-                    relation='belongs_to',
-                    weight=weight,
-                    paper_count=count,
-                    total_papers=total_papers
-                )
-                self.stats.idea_belongs_to_domain += 1
+        # 展平所有 (Idea, 来源 Paper) 对，一次 bincount 统计每个 (Idea, Domain) 的 Paper 数量
+        pair_ideas = []
+        pair_papers = []
+        for idea_iloc, idea in enumerate(self.ideas):
+            for paper_id in idea.get('source_paper_ids', []):
+                paper_iloc = self.paper_idx.get(paper_id)
+                if paper_iloc is not None:
+                    pair_ideas.append(idea_iloc)
+                    pair_papers.append(paper_iloc)
+
+        pair_ideas = np.asarray(pair_ideas, dtype=np.int64)
+        pair_domains = self.paper_domain_iloc[np.asarray(pair_papers, dtype=np.int64)]
+        has_domain = pair_domains >= 0
+        n_dom = len(self.domain_ids)
+        key = pair_ideas[has_domain] * n_dom + pair_domains[has_domain]
+        counts = np.bincount(key, minlength=len(self.ideas) * n_dom).reshape(len(self.ideas), n_dom)
+
+        # 计算每个 Domain 的权重并创建边
+        edges = []
+        for idea_iloc, dom_iloc in zip(*np.nonzero(counts)):
+            idea = self.ideas[idea_iloc]
+            count = int(counts[idea_iloc, dom_iloc])
+            total_papers = len(idea['source_paper_ids'])
+            weight = count / total_papers  # 占比作为权重
+
+            edges.append((idea['idea_id'], self.domain_ids[dom_iloc], {
+                'relation': 'belongs_to',
+                'weight': weight,
+                'paper_count': count,
+                'total_papers': total_papers
+            }))
+
+        self._add_edges('belongs_to', edges)
+        self.stats.idea_belongs_to_domain += len(edges)
 
         print(f"  ✓ 共构建 {self.stats.idea_belongs_to_domain} 条 belongs_to 边")
 
@@ -265,65 +306,60 @@ class EdgeBuilder:
         """
         print("\n🌍 构建 Pattern -[works_well_in]-> Domain 效果边...")
 
-        for pattern in self.patterns:
-            pattern_id = pattern['pattern_id']
-
-            # 统计每个 Domain 中使用该 Pattern 的 Paper
-            domain_stats = defaultdict(lambda: {'papers': [], 'qualities': []})
-
-            for paper in self.papers:
-                # V3: Paper 有 pattern_id 字段（单个）
-                if paper.get('pattern_id', '') != pattern_id:
-                    continue
-
-                paper_quality = self._get_paper_quality(paper)
-                # V3: Paper 有 domain_id 字段
-                domain_id = paper.get('domain_id', '')
-
-                if domain_id:
-                    domain_stats[domain_id]['papers'].append(paper['paper_id'])
-                    domain_stats[domain_id]['qualities'].append(paper_quality)
-
-            # 为每个 Domain 创建 works_well_in 边
-            for domain_id, stats in domain_stats.items():
-                if not stats['papers']:
-                    continue
-
-                # 计算平均质量
-                qualities = stats['qualities']
-                avg_quality = np.mean(qualities)
-
-                # 计算领域基线
-                domain = self.domain_id_to_domain.get(domain_id)
-                if not domain:
-                    continue
-
-                # V3: 根据 domain_id 筛选 Paper
-                domain_papers = [p for p in self.papers
-                                if p.get('domain_id', '') == domain_id]
-                domain_baseline = np.mean([self._get_paper_quality(p) for p in domain_papers]) if domain_papers else 0.7
-
-                # 效果 = 平均质量 - 基线
-                effectiveness = avg_quality - domain_baseline
-
-                # 频率
-                frequency = len(stats['papers'])
-
-                # 置信度 (样本数越多越可信)
-                confidence = min(frequency / 20, 1.0)
-
-                # 添加边
-                self.G.add_edge(
-                    pattern_id,
-                    domain_id,
-                    relation='works_well_in',
-                    frequency=frequency,
-                    effectiveness=effectiveness,
-                    confidence=confidence,
-                    avg_quality=avg_quality,
-                    baseline=domain_baseline
-                )
-                self.stats.pattern_works_well_in_domain += 1
+        n_pat, n_dom = len(self.patterns), len(self.domains)
+        if n_pat == 0 or n_dom == 0:
+            print(f"  ✓ 共构建 {self.stats.pattern_works_well_in_domain} 条 works_well_in 边")
+            return
+
+        # 只统计 nodes_domain 中存在的 Domain（下标 < n_dom）
+        paper_pattern = self.paper_pattern_iloc
+        paper_domain = self.paper_domain_iloc
+        has_domain = (paper_domain >= 0) & (paper_domain < n_dom)
+
+        # 领域基线: 每个 Domain 中全部 Paper 的平均质量
+        base_sum = np.bincount(paper_domain[has_domain],
+                               weights=self.paper_quality[has_domain], minlength=n_dom)
+        base_cnt = np.bincount(paper_domain[has_domain], minlength=n_dom)
+        baseline = np.full(n_dom, 0.7)
+        np.divide(base_sum, base_cnt, out=baseline, where=base_cnt > 0)
+
+        # 按 (Pattern, Domain) 分组统计 Paper 数量与质量之和
+        mask = has_domain & (paper_pattern >= 0)
+        key = paper_pattern[mask] * n_dom + paper_domain[mask]
+        sum_q = np.bincount(key, weights=self.paper_quality[mask],
+                            minlength=n_pat * n_dom).reshape(n_pat, n_dom)
+        cnt = np.bincount(key, minlength=n_pat * n_dom).reshape(n_pat, n_dom)
+
+        # 为每个 (Pattern, Domain) 组合创建 works_well_in 边
+        edges = []
+        for pat_iloc, dom_iloc in zip(*np.nonzero(cnt)):
+            # 频率
+            frequency = int(cnt[pat_iloc, dom_iloc])
+
+            # 计算平均质量
+            avg_quality = float(sum_q[pat_iloc, dom_iloc] / frequency)
+            domain_baseline = float(baseline[dom_iloc])
+
+            # 效果 = 平均质量 - 基线
+            effectiveness = avg_quality - domain_baseline
+
+            # 置信度 (样本数越多越可信)
+            confidence = min(frequency / 20, 1.0)
+
+            # 添加边
+            pattern_id = self.patterns[pat_iloc]['pattern_id']
+            domain_id = self.domain_ids[dom_iloc]
+            edges.append((pattern_id, domain_id, {
+                'relation': 'works_well_in',
+                'frequency': frequency,
+                'effectiveness': effectiveness,
+                'confidence': confidence,
+                'avg_quality': avg_quality,
+                'baseline': domain_baseline
+            }))
+
+        self._add_edges('works_well_in', edges)
+        self.stats.pattern_works_well_in_domain += len(edges)
 
         print(f"  ✓ 共构建 {self.stats.pattern_works_well_in_domain} 条 works_well_in 边")
 
@@ -336,102 +372,159 @@ class EdgeBuilder:
           - similarity: Idea 描述与 Paper core_idea 的语义相似度
           - quality: Paper 的综合质量分数
           - combined_weight: similarity * quality - 结合相似度和质量
+
+        相似度使用词袋 Jaccard：先将所有文本一次性向量化为二值词项矩阵，
+        再通过稀疏矩阵乘法批量求交集大小，避免逐对分词和建集合。
         """
         print("\n🔗 构建 Idea -[similar_to_paper]-> Paper 边...")
 
-        for idea in self.ideas:
+        top_k = 50  # 每个 Idea 最多连接 50 个相似 Paper
+        min_similarity = 0.1  # 过滤低相似度的Paper (阈值可调)
+        block_size = 512  # 每批处理的 Idea 数（控制稠密中间矩阵的内存）
+
+        # V3: Paper 的 idea 字段是字符串，而不是字典
+        ideas = [i for i in self.ideas if i.get('description', '')]
+        paper_ilocs = [i for i, p in enumerate(self.papers) if p.get('idea', '')]
+        papers = [self.papers[i] for i in paper_ilocs]
+        if not ideas or not papers:
+            print(f"  ✓ 共构建 {self.stats.idea_similar_to_paper} 条 similar_to_paper 边")
+            return
+
+        # 二值词项矩阵：每段文本只分词一次（一行即该文本的词集合）
+        vectorizer = CountVectorizer(analyzer=_tokenize, binary=True, dtype=np.int32)
+        term_mat = vectorizer.fit_transform(
+            [i['description'] for i in ideas] + [p['idea'] for p in papers]
+        ).tocsr()
+        idea_mat = term_mat[:len(ideas)]
+        paper_mat = term_mat[len(ideas):]
+
+        idea_sizes = np.asarray(idea_mat.sum(axis=1)).ravel()
+        paper_sizes = np.asarray(paper_mat.sum(axis=1)).ravel()
+        paper_quality = self.paper_quality[paper_ilocs]
+
+        # 长度比预过滤: Jaccard <= min(|A|,|B|) / max(|A|,|B|)，
+        # 比值低于阈值的 (Idea, Paper) 对不可能入选。
+        # Idea 和 Paper 都按词数排序，每批 Idea 只需与词数落在
+        # [最小词数 * 阈值, 最大词数 / 阈值] 内的一段连续 Paper 计算交集。
+        idea_order = np.argsort(idea_sizes, kind='stable')
+        paper_order = np.argsort(paper_sizes, kind='stable')
+        sorted_paper_sizes = paper_sizes[paper_order]
+        sorted_paper_mat_t = paper_mat[paper_order].T.tocsc()
+
+        def score_block(start: int):
+            """计算一批 Idea 的 Top-K 相似 Paper
+
+            返回 (Idea 下标, 列下标, 相似度, 综合权重)，后三者形状为 (批大小, K)
+            """
+            rows = idea_order[start:start + block_size]
+            lo, hi = idea_sizes[rows[0]], idea_sizes[rows[-1]]
+            col_start = np.searchsorted(sorted_paper_sizes, lo * min_similarity - 1e-9, side='left')
+            col_stop = np.searchsorted(sorted_paper_sizes, hi / min_similarity + 1e-9, side='right')
+            cols = paper_order[col_start:col_stop]
+            if len(cols) == 0:
+                empty = np.empty((len(rows), 0))
+                return rows, empty.astype(np.int64), empty, empty
+
+            # Jaccard = |A∩B| / (|A| + |B| - |A∩B|)
+            inter = (idea_mat[rows] @ sorted_paper_mat_t[:, col_start:col_stop]).toarray().astype(np.float64)
+            union = idea_sizes[rows, None] + paper_sizes[None, cols] - inter
+            sim = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+            weight = sim * paper_quality[None, cols]
+            weight[sim < min_similarity] = -np.inf
+
+            # 只保留 Top-K 个相似 Paper (避免边太多)
+            # argpartition 先 O(M) 选出 Top-K，再只对这 K 个排序（同分按 Paper 顺序）
+            k = min(top_k, weight.shape[1])
+            if k < weight.shape[1]:
+                top = np.argpartition(-weight, k - 1, axis=1)[:, :k]
+                # 第 K 名存在并列时 argpartition 的取舍不确定，这些行改用稳定排序
+                kth = np.take_along_axis(weight, top, axis=1).min(axis=1)
+                tied = (kth > -np.inf) & ((weight >= kth[:, None]).sum(axis=1) > k)
+                for r in np.nonzero(tied)[0]:
+                    top[r] = np.lexsort((cols, -weight[r]))[:k]
+            else:
+                top = np.broadcast_to(np.arange(k), weight.shape)
+            top_cols = cols[top]
+            top_weight = np.take_along_axis(weight, top, axis=1)
+            order = np.lexsort((top_cols, -top_weight), axis=-1)
+            top = np.take_along_axis(top, order, axis=1)
+
+            return (rows,
+                    cols[top],
+                    np.take_along_axis(sim, top, axis=1),
+                    np.take_along_axis(weight, top, axis=1))
+
+        # 各批相互独立，且主要耗时在释放 GIL 的 NumPy/SciPy 内核中，用线程并行
+        starts = range(0, len(ideas), block_size)
+        max_workers = min(4, os.cpu_count() or 1)
+        results = [None] * len(ideas)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for rows, top_cols, top_sim, top_weight in executor.map(score_block, starts):
+                for i, row in enumerate(rows):
+                    results[row] = (top_cols[i], top_sim[i], top_weight[i])
+
+        # 按 Idea 原始顺序写边
+        edges = []
+        for idea, (top_cols, top_sim, top_weight) in zip(ideas, results):
             idea_id = idea['idea_id']
-            idea_desc = idea.get('description', '')
 
-            if not idea_desc:
-                continue
-
-            # 与所有 Paper 计算相似度
-            similarities = []
-
-            for paper in self.papers:
-                paper_id = paper['paper_id']
-                # V3: Paper 的 idea 字段是字符串，而不是字典
-                paper_idea = paper.get('idea', '')
+            for col, similarity, combined_weight in zip(top_cols, top_sim, top_weight):
+                if combined_weight == -np.inf:
+                    break
+                edges.append((idea_id, papers[col]['paper_id'], {
+                    'relation': 'similar_to_paper',
+                    'similarity': float(similarity),
+                    'quality': float(paper_quality[col]),
+                    'combined_weight': float(combined_weight)
+                }))
 
-                if not paper_idea:
-                    continue
-
-                # 计算语义相似度（使用简单的词袋相似度）
-                similarity = self._compute_text_similarity(idea_desc, paper_idea)
-
-                # 过滤低相似度的Paper (阈值可调)
-                if similarity < 0.1:
-                    continue
-
-                paper_quality = self._get_paper_quality(paper)
-                combined_weight = similarity * paper_quality
-
-                similarities.append({
-                    'paper_id': paper_id,
-                    'similarity': similarity,
-                    'quality': paper_quality,
-                    'combined_weight': combined_weight
-                })
-
-            # 排序并只保留 Top-K 个相似 Paper (避免边太多)
-            similarities.sort(key=lambda x: x['combined_weight'], reverse=True)
-            top_k = 50  # 每个 Idea 最多连接 50 个相似 Paper
-
-            for item in similarities[:top_k]:
-                self.G.add_edge(
-                    idea_id,
-                    item['paper_id'],
-                    relation='similar_to_paper',
-                    similarity=item['similarity'],
-                    quality=item['quality'],
-                    combined_weight=item['combined_weight']
-                )
-                self.stats.idea_similar_to_paper += 1
+        self._add_edges('similar_to_paper', edges)
+        self.stats.idea_similar_to_paper += len(edges)
 
         print(f"  ✓ 共构建 {self.stats.idea_similar_to_paper} 条 similar_to_paper 边")
 
     # ===================== 辅助函数 =====================
 
-    def _get_paper_quality(self, paper: Dict) -> float:
-        """计算 Paper 的综合质量分数
-
-        基于 review 的评分，归一化到 [0, 1]
-        """
-        # V3: 使用 review_stats 中的 avg_score
-        review_stats = paper.get('review_stats', {})
-        avg_score = review_stats.get('avg_score', 0.5)
-
-        # 如果没有 review 数据，返回默认值
-        if avg_score == 0.5 and review_stats.get('review_count', 0) == 0:
-            return 0.5
+    def _add_edges(self, relation: str, edges: List):
+        """批量写入一类边，并保留到 relation 对应的缓冲区"""
+        self.G.add_edges_from(edges)
+        self._edge_buffers.setdefault(relation, []).extend(edges)
 
-        # avg_score 已经被归一化到 [0, 1]
-        return min(max(avg_score, 0.0), 1.0)
+    def _iter_edges(self):
+        """遍历图中的边 (u, v, attrs)
 
-    def _compute_text_similarity(self, text1: str, text2: str) -> float:
-        """计算两段文本的简单相似度
-
-        使用词袋模型 + Jaccard 相似度
+        所有边都经 _add_edges 写入：缓冲区总条数等于图的边数时没有重复的 (u, v)，
+        直接按构建顺序流式输出缓冲区；否则（如重复的 paper_id 产生重复边）
+        回退到 G.edges(data=True)，与 DiGraph 的去重语义（后写入的属性覆盖）一致
         """
-        # 简单分词（按空格和标点）
-        def tokenize(text):
-            import re
-            text = text.lower()
-            tokens = re.findall(r'\b\w+\b', text)
-            return set(tokens)
-
-        tokens1 = tokenize(text1)
-        tokens2 = tokenize(text2)
-
-        if not tokens1 or not tokens2:
-            return 0.0
+        if sum(map(len, self._edge_buffers.values())) == self.G.number_of_edges():
+            for edges in self._edge_buffers.values():
+                yield from edges
+        else:
+            yield from self.G.edges(data=True)
+
+    @staticmethod
+    def _valid_rows(ilocs: np.ndarray, n: int):
+        """返回下标落在 [0, n) 内的 (Paper 行号数组, 目标下标数组)"""
+        rows = np.nonzero((ilocs >= 0) & (ilocs < n))[0]
+        return rows, ilocs[rows]
+
+    @staticmethod
+    def _compute_paper_quality(papers: List[Dict]) -> np.ndarray:
+        """批量计算 Paper 的综合质量分数
 
-        # Jaccard 相似度
-        intersection = len(tokens1 & tokens2)
-        union = len(tokens1 | tokens2)
-
-        return intersection / union if union > 0 else 0.0
+        基于 review 的评分，归一化到 [0, 1]
+        """
+        # V3: 使用 review_stats 中的 avg_score（已被归一化到 [0, 1]），
+        # 没有 review 数据时默认 0.5
+        avg_scores = np.fromiter(
+            (p.get('review_stats', {}).get('avg_score', 0.5) for p in papers),
+            dtype=np.float64,
+            count=len(papers)
+        )
+        return np.clip(avg_scores, 0.0, 1.0)
 
     # ===================== 保存和统计 =====================
 
@@ -439,24 +532,19 @@ class EdgeBuilder:
         """保存边数据"""
         print("\n💾 保存边数据...")
 
-        # 1. 保存为 JSON
-        edges_data = []
-        for u, v, data in self.G.edges(data=True):
-            edge = {
-                'source': u,
-                'target': v,
-                **data
-            }
-            edges_data.append(edge)
-
-        with open(EDGES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(edges_data, f, ensure_ascii=False, indent=2)
+        # 1. 保存为 JSON（逐条流式写出，每行一条边，不在内存中拼完整列表）
+        with open(EDGES_FILE, 'wb') as f:
+            f.write(b'[\n')
+            for i, (u, v, data) in enumerate(self._iter_edges()):
+                if i:
+                    f.write(b',\n')
+                f.write(dumps_json({'source': u, 'target': v, **data}, indent=False))
+            f.write(b'\n]\n')
         print(f"  ✓ 保存到: {EDGES_FILE}")
 
         # 2. 保存完整图谱（包含节点和边）
-        import pickle
         with open(GRAPH_FILE, 'wb') as f:
-            pickle.dump(self.G, f)
+            pickle.dump(self.G, f, protocol=pickle.HIGHEST_PROTOCOL)
         print(f"  ✓ 保存到: {GRAPH_FILE}")
 
     def _print_stats(self):
@@ -470,8 +558,7 @@ class EdgeBuilder:
         print(f"  Paper->Domain:              {self.stats.paper_in_domain} 条")
 
         print("\n【Review 质量边】")
-        review_edges = sum(1 for u, v, d in self.G.edges(data=True) if d.get('relation') == 'has_review')
-        print(f"  Paper->Review:              {review_edges} 条")
+        print(f"  Paper->Review:              {self.stats.paper_has_review} 条")
         print(f"  关联论文数:                  {len([p for p in self.papers if p.get('review_ids')])} 篇")
         print(f"  总Review数:                  {len(self.reviews)} 条")
 
@@ -20,12 +20,17 @@
   - output/knowledge_graph_stats.json: 统计信息
 """
 
-import hashlib
-import json
+import os
+import sys
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+# 导入pipeline工具函数
+sys.path.insert(0, str(Path(__file__).parent))
+from pipeline.utils import idea_key, load_json, save_json, save_json_list
 
 # ===================== 配置 =====================
 
@@ -44,7 +49,26 @@ NODES_DOMAIN = OUTPUT_DIR / "nodes_domain.json"
 NODES_PAPER = OUTPUT_DIR / "nodes_paper.json"
 STATS_FILE = OUTPUT_DIR / "knowledge_graph_stats.json"
 
-CONFERENCES = ["ACL_2017", "ARR_2022", "COLING_2020"]
+# 会议目录白名单（如 ["ACL_2017", "ARR_2022", "COLING_2020"]）；
+# 为 None 时自动发现 DATA_DIR 下的所有会议目录
+CONFERENCES: Optional[List[str]] = None
+
+# 并发加载论文文件的线程数
+LOAD_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+# ===================== 工具函数 =====================
+
+def _discover_conference_dirs() -> List[Path]:
+    """列出待加载的会议目录（按名称排序，跳过 _ / . 开头的目录）"""
+    if not DATA_DIR.is_dir():
+        return []
+    if CONFERENCES is not None:
+        return [DATA_DIR / name for name in CONFERENCES if (DATA_DIR / name).is_dir()]
+    return sorted(
+        p for p in DATA_DIR.iterdir()
+        if p.is_dir() and not p.name.startswith(('_', '.'))
+    )
 
 
 # ===================== 数据类 =====================
@@ -74,11 +98,14 @@ class KnowledgeGraphBuilderV2:
         self.paper_nodes: List[Dict] = []
 
         # 去重映射
-        self.idea_map: Dict[str, str] = {}      # idea_hash -> idea_id
+        self.idea_map: Dict[bytes, str] = {}    # idea_hash -> idea_id
         self.domain_map: Dict[str, str] = {}    # domain_name -> domain_id
         self.pattern_map: Dict[int, str] = {}   # pattern_id -> pattern_id
         self.paper_map: Dict[str, str] = {}     # paper_id -> paper_id
 
+        # 会议目录（build 时发现一次，论文和 Review 加载共用）
+        self.conference_dirs: List[Path] = []
+
     def build(self):
         """构建完整的知识图谱"""
         print("=" * 60)
@@ -87,6 +114,7 @@ class KnowledgeGraphBuilderV2:
 
         # Step 1: 加载数据
         print("\n【Step 1】加载数据")
+        self.conference_dirs = _discover_conference_dirs()
         papers = self._load_papers()
         patterns = self._load_patterns()
         reviews = self._load_reviews()
@@ -123,27 +151,21 @@ class KnowledgeGraphBuilderV2:
     def _load_papers(self) -> List[Dict]:
         """加载所有论文数据"""
         papers = []
-        for conference in CONFERENCES:
-            conf_dir = DATA_DIR / conference
-            if not conf_dir.exists():
-                continue
-
+        for conf_dir in self.conference_dirs:
+            conference = conf_dir.name
             all_papers_file = conf_dir / "_all_paper_nodes.json"
             if all_papers_file.exists():
-                with open(all_papers_file, 'r', encoding='utf-8') as f:
-                    conf_papers = json.load(f)
-                    papers.extend(conf_papers)
-                    print(f"  📂 {conference}: {len(conf_papers)} 篇")
+                conf_papers = load_json(all_papers_file, use_mmap=True)
+                papers.extend(conf_papers)
+                print(f"  📂 {conference}: {len(conf_papers)} 篇")
             else:
-                count = 0
-                for file in conf_dir.glob("*_paper_node.json"):
-                    if file.name.startswith("_"):
-                        continue
-                    with open(file, 'r', encoding='utf-8') as f:
-                        papers.append(json.load(f))
-                        count += 1
-                if count > 0:
-                    print(f"  📂 {conference}: {count} 篇")
+                # 逐篇文件较多时并发解析（保持 glob 顺序）
+                files = [file for file in conf_dir.glob("*_paper_node.json")
+                         if not file.name.startswith("_")]
+                with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+                    papers.extend(executor.map(load_json, files))
+                if files:
+                    print(f"  📂 {conference}: {len(files)} 篇")
         return papers
 
     def _load_patterns(self) -> List[Dict]:
@@ -151,22 +173,15 @@ class KnowledgeGraphBuilderV2:
         if not PATTERNS_FILE.exists():
             print(f"⚠️  Pattern 文件不存在: {PATTERNS_FILE}")
             return []
-        with open(PATTERNS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_json(PATTERNS_FILE)
 
     def _load_reviews(self) -> List[Dict]:
         """加载所有 Review 数据"""
         reviews = []
-        for conference in CONFERENCES:
-            conf_dir = DATA_DIR / conference
-            if not conf_dir.exists():
-                continue
-
+        for conf_dir in self.conference_dirs:
             all_reviews_file = conf_dir / "_all_review_nodes.json"
             if all_reviews_file.exists():
-                with open(all_reviews_file, 'r', encoding='utf-8') as f:
-                    conf_reviews = json.load(f)
-                    reviews.extend(conf_reviews)
+                reviews.extend(load_json(all_reviews_file))
         return reviews
 
     def _load_paper_to_pattern(self) -> Dict[str, int]:
@@ -175,8 +190,7 @@ class KnowledgeGraphBuilderV2:
         if not mapping_file.exists():
             print(f"⚠️  paper_to_pattern.json 不存在，Paper 节点将无 pattern_ids")
             return {}
-        with open(mapping_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_json(mapping_file)
 
     # ===================== 构建节点 =====================
 
@@ -184,6 +198,8 @@ class KnowledgeGraphBuilderV2:
         """构建 Idea 节点（第一遍：仅收集 Idea 和 Paper 映射）"""
         print("\n💡 构建 Idea 节点...")
 
+        idea_node_by_id: Dict[str, Dict] = {}
+
         for paper in papers:
             ideal_info = paper.get('ideal', {})
             core_idea = ideal_info.get('core_idea', '')
@@ -191,30 +207,33 @@ class KnowledgeGraphBuilderV2:
             if not core_idea:
                 continue
 
+            paper_id = paper.get('paper_id', '')
+
             # 用 hash 去重
-            idea_hash = hashlib.md5(core_idea.encode()).hexdigest()[:16]
+            idea_hash = idea_key(core_idea)
 
-            if idea_hash not in self.idea_map:
+            # 单次查表：不存在时才创建
+            idea_id = self.idea_map.get(idea_hash)
+            if idea_id is None:
                 idea_id = f"idea_{len(self.idea_nodes)}"
                 self.idea_map[idea_hash] = idea_id
 
-                self.idea_nodes.append({
+                idea_node = {
                     'idea_id': idea_id,
                     'description': core_idea,
                     'tech_stack': ideal_info.get('tech_stack', []),
                     'input_type': ideal_info.get('input_type', ''),
                     'output_type': ideal_info.get('output_type', ''),
-                    'source_paper_ids': [paper.get('paper_id', '')],  # 记录来源
+                    'source_paper_ids': [paper_id],  # 记录来源
                     'pattern_ids': []  # 占位，稍后填充
-                })
+                }
+                self.idea_nodes.append(idea_node)
+                idea_node_by_id[idea_id] = idea_node
             else:
                 # 已存在的 Idea，追加 paper_id
-                idea_id = self.idea_map[idea_hash]
-                for idea_node in self.idea_nodes:
-                    if idea_node['idea_id'] == idea_id:
-                        if paper.get('paper_id', '') not in idea_node['source_paper_ids']:
-                            idea_node['source_paper_ids'].append(paper.get('paper_id', ''))
-                        break
+                idea_node = idea_node_by_id[idea_id]
+                if paper_id not in idea_node['source_paper_ids']:
+                    idea_node['source_paper_ids'].append(paper_id)
 
         print(f"  ✓ 创建 {len(self.idea_nodes)} 个 Idea 节点")
 
@@ -225,6 +244,8 @@ class KnowledgeGraphBuilderV2:
         for pattern in patterns:
             pattern_id = pattern.get('pattern_id')
             self.pattern_map[pattern_id] = f"pattern_{pattern_id}"
+            metadata = pattern.get('metadata', {})
+            common_tricks = pattern.get('common_tricks', [])
 
             # 提取关键信息
             self.pattern_nodes.append({
@@ -232,20 +253,20 @@ class KnowledgeGraphBuilderV2:
                 'name': pattern.get('pattern_name', ''),
                 'summary': pattern.get('pattern_summary', ''),
                 'writing_guide': pattern.get('writing_guide', ''),
-                'cluster_size': pattern.get('metadata', {}).get('cluster_size', 0),
-                'coherence_score': pattern.get('metadata', {}).get('coherence_score', 0),
-                'paper_ids': pattern.get('metadata', {}).get('all_paper_ids', []),
+                'cluster_size': metadata.get('cluster_size', 0),
+                'coherence_score': metadata.get('coherence_score', 0),
+                'paper_ids': metadata.get('all_paper_ids', []),
 
                 # 精简的 Skeleton 和 Trick 统计
                 'skeleton_count': len(pattern.get('skeleton_examples', [])),
-                'trick_count': len(pattern.get('common_tricks', [])),
+                'trick_count': len(common_tricks),
                 'top_tricks': [
                     {
                         'name': t.get('trick_name', ''),
                         'frequency': t.get('frequency', 0),
                         'percentage': t.get('percentage', '')
                     }
-                    for t in pattern.get('common_tricks', [])[:5]  # 仅保留 Top 5
+                    for t in common_tricks[:5]  # 仅保留 Top 5
                 ]
             })
 
@@ -265,26 +286,24 @@ class KnowledgeGraphBuilderV2:
         for paper in papers:
             domain_info = paper.get('domain', {})
             domains_list = domain_info.get('domains', [])
+            research_object = domain_info.get('research_object')
+            core_technique = domain_info.get('core_technique')
+            application = domain_info.get('application')
 
             for domain_name in domains_list:
                 if not domain_name:
                     continue
 
-                domain_stats[domain_name]['paper_count'] += 1
+                stats = domain_stats[domain_name]
+                stats['paper_count'] += 1
 
                 # 聚合信息
-                if domain_info.get('research_object'):
-                    domain_stats[domain_name]['research_objects'].add(
-                        domain_info['research_object']
-                    )
-                if domain_info.get('core_technique'):
-                    domain_stats[domain_name]['core_techniques'].add(
-                        domain_info['core_technique']
-                    )
-                if domain_info.get('application'):
-                    domain_stats[domain_name]['applications'].add(
-                        domain_info['application']
-                    )
+                if research_object:
+                    stats['research_objects'].add(research_object)
+                if core_technique:
+                    stats['core_techniques'].add(core_technique)
+                if application:
+                    stats['applications'].add(application)
 
         # 生成 Domain 节点
         for domain_name, stats in domain_stats.items():
@@ -380,18 +399,18 @@ class KnowledgeGraphBuilderV2:
         """填充 Idea 节点的 pattern_ids（通过 Paper 中转）"""
         print("\n🔗 构建 Idea -> Pattern 映射...")
 
+        # paper_id -> pattern_ids（重复 paper_id 以第一个节点为准）
+        paper_pattern_ids: Dict[str, List[str]] = {}
+        for paper_node in self.paper_nodes:
+            paper_pattern_ids.setdefault(paper_node['paper_id'], paper_node['pattern_ids'])
+
         # 遍历每个 Idea
         for idea_node in self.idea_nodes:
-            idea_id = idea_node['idea_id']
             pattern_ids_set = set()
 
-            # 找到所有实现该 Idea 的 Paper
+            # 找到所有实现该 Idea 的 Paper，获取 pattern_ids
             for paper_id in idea_node['source_paper_ids']:
-                # 从 Paper 中获取 pattern_ids
-                for paper_node in self.paper_nodes:
-                    if paper_node['paper_id'] == paper_id:
-                        pattern_ids_set.update(paper_node['pattern_ids'])
-                        break
+                pattern_ids_set.update(paper_pattern_ids.get(paper_id, ()))
 
             # 填充到 Idea 节点
             idea_node['pattern_ids'] = sorted(list(pattern_ids_set))
@@ -407,23 +426,19 @@ class KnowledgeGraphBuilderV2:
         OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
         # 保存 Idea 节点
-        with open(NODES_IDEA, 'w', encoding='utf-8') as f:
-            json.dump(self.idea_nodes, f, ensure_ascii=False, indent=2)
+        save_json_list(self.idea_nodes, NODES_IDEA)
         print(f"  ✓ {NODES_IDEA}")
 
         # 保存 Pattern 节点
-        with open(NODES_PATTERN, 'w', encoding='utf-8') as f:
-            json.dump(self.pattern_nodes, f, ensure_ascii=False, indent=2)
+        save_json_list(self.pattern_nodes, NODES_PATTERN)
         print(f"  ✓ {NODES_PATTERN}")
 
         # 保存 Domain 节点
-        with open(NODES_DOMAIN, 'w', encoding='utf-8') as f:
-            json.dump(self.domain_nodes, f, ensure_ascii=False, indent=2)
+        save_json_list(self.domain_nodes, NODES_DOMAIN)
         print(f"  ✓ {NODES_DOMAIN}")
 
         # 保存 Paper 节点
-        with open(NODES_PAPER, 'w', encoding='utf-8') as f:
-            json.dump(self.paper_nodes, f, ensure_ascii=False, indent=2)
+        save_json_list(self.paper_nodes, NODES_PAPER)
         print(f"  ✓ {NODES_PAPER}")
 
     def _update_stats(self):
@@ -441,8 +456,7 @@ class KnowledgeGraphBuilderV2:
 
     def _save_stats(self):
         """保存统计信息"""
-        with open(STATS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(asdict(self.stats), f, ensure_ascii=False, indent=2)
+        save_json(asdict(self.stats), STATS_FILE)
         print(f"  ✓ {STATS_FILE}")
 
     def _print_stats(self):
@@ -21,9 +21,8 @@
   - output/knowledge_graph_stats.json
 """
 
-import hashlib
-import json
 import os
+import re
 import sys
 from collections import defaultdict
 from dataclasses import dataclass, asdict
@@ -32,7 +31,7 @@ from typing import Dict, List
 
 # 导入pipeline工具函数
 sys.path.insert(0, str(Path(__file__).parent))
-from pipeline.utils import call_llm, parse_json_from_llm
+from pipeline.utils import call_llm, idea_key, json_loads, parse_json_from_llm, save_json, save_json_list
 
 # ===================== 配置 =====================
 
@@ -55,6 +54,9 @@ NODES_PAPER = OUTPUT_DIR / "nodes_paper.json"
 NODES_REVIEW = OUTPUT_DIR / "nodes_review.json"  # 新增：Review 节点
 STATS_FILE = OUTPUT_DIR / "knowledge_graph_stats.json"
 
+# 评分字符串中的数字（例如 "6: marginally above..." -> "6"）
+_SCORE_NUMBER_RE = re.compile(r'\d+')
+
 # LLM API 配置
 SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY", "")
 LLM_API_URL = os.getenv("LLM_API_URL", "https://api.siliconflow.cn/v1/chat/completions")
@@ -90,7 +92,7 @@ class KnowledgeGraphBuilderV3:
         self.review_nodes: List[Dict] = []  # 新增：Review 节点
 
         # 去重映射
-        self.idea_map: Dict[str, str] = {}           # idea_hash -> idea_id
+        self.idea_map: Dict[bytes, str] = {}         # idea_hash -> idea_id
         self.domain_map: Dict[str, str] = {}         # domain_name -> domain_id
         self.pattern_map: Dict[int, str] = {}        # cluster_id -> pattern_id
         self.global_pattern_map: Dict[str, str] = {} # global_pattern_id -> idea_id
@@ -129,9 +131,7 @@ class KnowledgeGraphBuilderV3:
 
         # Step 3: 建立关联
         print("\n【Step 3】建立节点关联")
-        self._link_paper_to_pattern(assignments)
-        self._link_paper_to_idea()
-        self._link_paper_to_domain()
+        self._link_paper_nodes()
         self._link_paper_to_review()  # 新增：关联 Paper 和 Review
         self._link_idea_to_pattern()
 
@@ -161,7 +161,7 @@ class KnowledgeGraphBuilderV3:
         with open(ASSIGNMENTS_FILE, 'r', encoding='utf-8') as f:
             for line in f:
                 if line.strip():
-                    assignments.append(json.loads(line))
+                    assignments.append(json_loads(line))
         return assignments
 
     def _load_clusters(self) -> List[Dict]:
@@ -174,7 +174,7 @@ class KnowledgeGraphBuilderV3:
         with open(CLUSTER_LIBRARY_FILE, 'r', encoding='utf-8') as f:
             for line in f:
                 if line.strip():
-                    clusters.append(json.loads(line))
+                    clusters.append(json_loads(line))
         return clusters
 
     def _load_pattern_details(self) -> Dict[str, Dict]:
@@ -187,7 +187,7 @@ class KnowledgeGraphBuilderV3:
         with open(PATTERN_DETAILS_FILE, 'r', encoding='utf-8') as f:
             for line in f:
                 if line.strip():
-                    item = json.loads(line)
+                    item = json_loads(line)
                     paper_id = item.get('paper_id')
                     if paper_id:
                         details[paper_id] = item
@@ -205,14 +205,14 @@ class KnowledgeGraphBuilderV3:
         with open(REVIEWS_FILE, 'r', encoding='utf-8') as f:
             for line in f:
                 if line.strip():
-                    item = json.loads(line)
+                    item = json_loads(line)
                     paper_id = item.get('id')  # 论文ID来自 'id' 字段
                     related_notes = item.get('related_notes', '[]')
 
                     # 解析 related_notes（是一个 JSON 字符串）
                     if isinstance(related_notes, str):
                         try:
-                            reviews_list = json.loads(related_notes)
+                            reviews_list = json_loads(related_notes)
                         except:
                             reviews_list = []
                     else:
@@ -238,6 +238,9 @@ class KnowledgeGraphBuilderV3:
             pattern_id = f"pattern_{cluster_id}"
             self.pattern_map[cluster_id] = pattern_id
 
+            retrieval_facets = cluster.get('retrieval_facets', {})
+            coherence = cluster.get('coherence', {})
+
             # 提取代表性论文的pattern信息
             exemplars = cluster.get('exemplars', [])
             exemplar_ideas = []
@@ -263,15 +266,15 @@ class KnowledgeGraphBuilderV3:
                 'size': cluster.get('size', 0),
 
                 # 领域信息
-                'domain': cluster.get('retrieval_facets', {}).get('domain', ''),
-                'sub_domains': cluster.get('retrieval_facets', {}).get('sub_domains', []),
+                'domain': retrieval_facets.get('domain', ''),
+                'sub_domains': retrieval_facets.get('sub_domains', []),
 
                 # 聚类质量指标
                 'coherence': {
-                    'centroid_mean': cluster.get('coherence', {}).get('centroid_mean', 0),
-                    'centroid_p50': cluster.get('coherence', {}).get('centroid_p50', 0),
-                    'pairwise_sample_mean': cluster.get('coherence', {}).get('pairwise_sample_mean', 0),
-                    'pairwise_sample_p50': cluster.get('coherence', {}).get('pairwise_sample_p50', 0)
+                    'centroid_mean': coherence.get('centroid_mean', 0),
+                    'centroid_p50': coherence.get('centroid_p50', 0),
+                    'pairwise_sample_mean': coherence.get('pairwise_sample_mean', 0),
+                    'pairwise_sample_p50': coherence.get('pairwise_sample_p50', 0)
                 },
 
                 # 代表性信息（从exemplars提取，包含story）
@@ -302,11 +305,16 @@ class KnowledgeGraphBuilderV3:
 
         enhanced_count = 0
 
+        # cluster_id -> cluster（重复 id 以第一个为准）
+        cluster_by_id: Dict[int, Dict] = {}
+        for c in clusters:
+            cluster_by_id.setdefault(c.get('cluster_id'), c)
+
         for idx, pattern_node in enumerate(self.pattern_nodes):
             cluster_id = pattern_node['cluster_id']
 
             # 找到对应的cluster
-            cluster = next((c for c in clusters if c.get('cluster_id') == cluster_id), None)
+            cluster = cluster_by_id.get(cluster_id)
             if not cluster:
                 continue
 
@@ -414,15 +422,19 @@ Make sure each sentence is detailed, informative, and captures the diversity of
         """构建 Idea 节点（从pattern_details的idea字段提取）"""
         print("\n💡 构建 Idea 节点...")
 
+        idea_node_by_id: Dict[str, Dict] = {}
+
         for paper_id, details in pattern_details.items():
             idea_text = details.get('idea', '')
             if not idea_text:
                 continue
 
             # 用hash去重
-            idea_hash = hashlib.md5(idea_text.encode()).hexdigest()[:16]
+            idea_hash = idea_key(idea_text)
 
-            if idea_hash not in self.idea_map:
+            # 单次查表：不存在时才创建
+            idea_id = self.idea_map.get(idea_hash)
+            if idea_id is None:
                 idea_id = f"idea_{len(self.idea_nodes)}"
                 self.idea_map[idea_hash] = idea_id
 
@@ -430,7 +442,7 @@ Make sure each sentence is detailed, informative, and captures the diversity of
                 patterns = details.get('research_patterns', [])
                 first_pattern = patterns[0] if patterns else {}
 
-                self.idea_nodes.append({
+                idea_node = {
                     'idea_id': idea_id,
                     'description': idea_text,
 
@@ -447,15 +459,14 @@ Make sure each sentence is detailed, informative, and captures the diversity of
                     # 来源信息
                     'source_paper_ids': [paper_id],
                     'pattern_ids': []  # 稍后填充
-                })
+                }
+                self.idea_nodes.append(idea_node)
+                idea_node_by_id[idea_id] = idea_node
             else:
                 # 已存在的Idea，追加paper_id
-                idea_id = self.idea_map[idea_hash]
-                for idea_node in self.idea_nodes:
-                    if idea_node['idea_id'] == idea_id:
-                        if paper_id not in idea_node['source_paper_ids']:
-                            idea_node['source_paper_ids'].append(paper_id)
-                        break
+                idea_node = idea_node_by_id[idea_id]
+                if paper_id not in idea_node['source_paper_ids']:
+                    idea_node['source_paper_ids'].append(paper_id)
 
         print(f"  ✓ 创建 {len(self.idea_nodes)} 个 Idea 节点")
 
@@ -479,16 +490,16 @@ Make sure each sentence is detailed, informative, and captures the diversity of
             paper_id = assignment.get('paper_id', '')
             cluster_id = assignment.get('cluster_id', -1)
 
-            domain_stats[domain]['paper_count'] += 1
-            domain_stats[domain]['paper_ids'].append(paper_id)
+            stats = domain_stats[domain]
+            stats['paper_count'] += 1
+            stats['paper_ids'].append(paper_id)
 
             # 聚合sub_domains
-            for sub_domain in assignment.get('sub_domains', []):
-                domain_stats[domain]['sub_domains'].add(sub_domain)
+            stats['sub_domains'].update(assignment.get('sub_domains', []))
 
             # 关联pattern
             if cluster_id != -1:
-                domain_stats[domain]['related_patterns'].add(f"pattern_{cluster_id}")
+                stats['related_patterns'].add(f"pattern_{cluster_id}")
 
         # 生成Domain节点
         for domain_name, stats in domain_stats.items():
@@ -625,8 +636,7 @@ Make sure each sentence is detailed, informative, and captures the diversity of
         }
 
         # 先尝试提取数字（例如 "6: marginally above..." -> 0.6）
-        import re
-        numbers = re.findall(r'\d+', score_str)
+        numbers = _SCORE_NUMBER_RE.findall(score_str)
         if numbers:
             for num_str in numbers:
                 if num_str in score_mapping:
@@ -647,46 +657,39 @@ Make sure each sentence is detailed, informative, and captures the diversity of
 
     # ===================== 建立关联 =====================
 
-    def _link_paper_to_pattern(self, assignments: List[Dict]):
-        """建立 Paper -> Pattern 关联"""
-        print("\n🔗 建立 Paper -> Pattern 关联...")
+    def _link_paper_nodes(self):
+        """建立 Paper -> Pattern / Idea / Domain 关联（一次遍历 Paper 节点）"""
+        print("\n🔗 建立 Paper -> Pattern / Idea / Domain 关联...")
+
+        pattern_count = idea_count = domain_count = 0
 
         for paper_node in self.paper_nodes:
+            # Paper -> Pattern
             cluster_id = paper_node.get('cluster_id', -1)
-            if cluster_id != -1 and cluster_id in self.pattern_map:
-                paper_node['pattern_id'] = self.pattern_map[cluster_id]
-
-        linked_count = sum(1 for p in self.paper_nodes if p['pattern_id'])
-        print(f"  ✓ {linked_count}/{len(self.paper_nodes)} 篇论文关联到Pattern")
-
-    def _link_paper_to_idea(self):
-        """建立 Paper -> Idea 关联"""
-        print("\n🔗 建立 Paper -> Idea 关联...")
+            pattern_id = self.pattern_map.get(cluster_id) if cluster_id != -1 else None
+            if pattern_id is not None:
+                paper_node['pattern_id'] = pattern_id
+                pattern_count += 1
 
-        for paper_node in self.paper_nodes:
-            paper_id = paper_node['paper_id']
+            # Paper -> Idea
             idea_text = paper_node.get('idea', '')
-
             if idea_text:
-                idea_hash = hashlib.md5(idea_text.encode()).hexdigest()[:16]
-                if idea_hash in self.idea_map:
-                    paper_node['idea_id'] = self.idea_map[idea_hash]
-
-        linked_count = sum(1 for p in self.paper_nodes if p['idea_id'])
-        print(f"  ✓ {linked_count}/{len(self.paper_nodes)} 篇论文关联到Idea")
-
-    def _link_paper_to_domain(self):
-        """建立 Paper -> Domain 关联"""
-        print("\n🔗 建立 Paper -> Domain 关联...")
+                idea_id = self.idea_map.get(idea_key(idea_text))
+                if idea_id is not None:
+                    paper_node['idea_id'] = idea_id
+                    idea_count += 1
 
-        for paper_node in self.paper_nodes:
+            # Paper -> Domain
             domain_name = paper_node.get('domain', '')
+            domain_id = self.domain_map.get(domain_name) if domain_name else None
+            if domain_id is not None:
+                paper_node['domain_id'] = domain_id
+                domain_count += 1
 
-            if domain_name and domain_name in self.domain_map:
-                paper_node['domain_id'] = self.domain_map[domain_name]
-
-        linked_count = sum(1 for p in self.paper_nodes if p['domain_id'])
-        print(f"  ✓ {linked_count}/{len(self.paper_nodes)} 篇论文关联到Domain")
+        total = len(self.paper_nodes)
+        print(f"  ✓ {pattern_count}/{total} 篇论文关联到Pattern")
+        print(f"  ✓ {idea_count}/{total} 篇论文关联到Idea")
+        print(f"  ✓ {domain_count}/{total} 篇论文关联到Domain")
 
     def _link_paper_to_review(self):
         """建立 Paper -> Review 关联并补充 Paper 的 Review 质量信息"""
@@ -707,36 +710,37 @@ Make sure each sentence is detailed, informative, and captures the diversity of
                 continue
 
             score_value = review_node.get('overall_score_value', 0.5)
-            paper_review_stats[paper_id]['review_ids'].append(review_node['review_id'])
-            paper_review_stats[paper_id]['review_count'] += 1
-            paper_review_stats[paper_id]['highest_score'] = max(
-                paper_review_stats[paper_id]['highest_score'], score_value
-            )
-            paper_review_stats[paper_id]['lowest_score'] = min(
-                paper_review_stats[paper_id]['lowest_score'], score_value
-            )
+            stats = paper_review_stats[paper_id]
+            stats['review_ids'].append(review_node['review_id'])
+            stats['review_count'] += 1
+            stats['highest_score'] = max(stats['highest_score'], score_value)
+            stats['lowest_score'] = min(stats['lowest_score'], score_value)
+
+        # review_id -> 分数、paper_id -> Paper 节点（重复 id 以第一个为准）
+        review_score: Dict[str, float] = {}
+        for r in self.review_nodes:
+            review_score.setdefault(r['review_id'], r['overall_score_value'])
+        paper_node_by_id: Dict[str, Dict] = {}
+        for paper_node in self.paper_nodes:
+            paper_node_by_id.setdefault(paper_node['paper_id'], paper_node)
 
         # 计算平均分并更新 Paper 节点
         for paper_id, stats in paper_review_stats.items():
             if stats['review_count'] > 0:
                 review_ids = stats['review_ids']
-                scores = [
-                    next((r['overall_score_value'] for r in self.review_nodes if r['review_id'] == rid), 0.5)
-                    for rid in review_ids
-                ]
+                scores = [review_score.get(rid, 0.5) for rid in review_ids]
                 stats['avg_score'] = sum(scores) / len(scores)
 
             # 找到对应的 Paper 节点并补充信息
-            for paper_node in self.paper_nodes:
-                if paper_node['paper_id'] == paper_id:
-                    paper_node['review_ids'] = stats['review_ids']
-                    paper_node['review_stats'] = {
-                        'review_count': stats['review_count'],
-                        'avg_score': stats['avg_score'],
-                        'highest_score': stats['highest_score'],
-                        'lowest_score': stats['lowest_score']
-                    }
-                    break
+            paper_node = paper_node_by_id.get(paper_id)
+            if paper_node is not None:
+                paper_node['review_ids'] = stats['review_ids']
+                paper_node['review_stats'] = {
+                    'review_count': stats['review_count'],
+                    'avg_score': stats['avg_score'],
+                    'highest_score': stats['highest_score'],
+                    'lowest_score': stats['lowest_score']
+                }
 
         linked_count = sum(1 for p in self.paper_nodes if p.get('review_ids'))
         print(f"  ✓ {linked_count}/{len(self.paper_nodes)} 篇论文关联到Review")
@@ -774,24 +778,19 @@ Make sure each sentence is detailed, informative, and captures the diversity of
         """保存所有节点到独立文件"""
         OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-        with open(NODES_IDEA, 'w', encoding='utf-8') as f:
-            json.dump(self.idea_nodes, f, ensure_ascii=False, indent=2)
+        save_json_list(self.idea_nodes, NODES_IDEA)
         print(f"  ✓ {NODES_IDEA}")
 
-        with open(NODES_PATTERN, 'w', encoding='utf-8') as f:
-            json.dump(self.pattern_nodes, f, ensure_ascii=False, indent=2)
+        save_json_list(self.pattern_nodes, NODES_PATTERN)
         print(f"  ✓ {NODES_PATTERN}")
 
-        with open(NODES_DOMAIN, 'w', encoding='utf-8') as f:
-            json.dump(self.domain_nodes, f, ensure_ascii=False, indent=2)
+        save_json_list(self.domain_nodes, NODES_DOMAIN)
         print(f"  ✓ {NODES_DOMAIN}")
 
-        with open(NODES_PAPER, 'w', encoding='utf-8') as f:
-            json.dump(self.paper_nodes, f, ensure_ascii=False, indent=2)
+        save_json_list(self.paper_nodes, NODES_PAPER)
         print(f"  ✓ {NODES_PAPER}")
 
-        with open(NODES_REVIEW, 'w', encoding='utf-8') as f:
-            json.dump(self.review_nodes, f, ensure_ascii=False, indent=2)
+        save_json_list(self.review_nodes, NODES_REVIEW)
         print(f"  ✓ {NODES_REVIEW}")
 
     def _update_stats(self):
@@ -811,8 +810,7 @@ Make sure each sentence is detailed, informative, and captures the diversity of
 
     def _save_stats(self):
         """保存统计信息"""
-        with open(STATS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(asdict(self.stats), f, ensure_ascii=False, indent=2)
+        save_json(asdict(self.stats), STATS_FILE)
         print(f"  ✓ {STATS_FILE}")
 
     def _print_stats(self):
@@ -19,6 +19,13 @@ API_URL = os.environ.get("LLM_API_URL", "https://api.openai.com/v1/chat/completi
 AUTH_TOKEN = os.environ.get("LLM_AUTH_TOKEN", "")
 MODEL = os.environ.get("LLM_MODEL", "gpt-4")
 
+# 预编译正则
+_WHITESPACE_RE = re.compile(r'\s+')
+_JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*(.*?)\s*```', re.DOTALL)
+
+# 复用 TCP/TLS 连接的 HTTP Session（批量抽取时逐篇调用 LLM）
+_HTTP_SESSION = requests.Session()
+
 if not AUTH_TOKEN:
     print("⚠️  警告: 未设置 LLM_AUTH_TOKEN 环境变量，抽取功能将不可用")
     print("   请设置环境变量: export LLM_AUTH_TOKEN='Bearer your_token_here'")
@@ -118,7 +125,7 @@ def parse_json_paper(json_path: str) -> PaperSections:
     # 清理文本但不截断
     def clean_text(text):
         text = text.strip()
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         return text
     
     return PaperSections(
@@ -199,7 +206,7 @@ def call_llm(prompt: str, system_prompt: str = "", temperature: float = 0.3, max
     for attempt in range(max_retries):
         try:
             print(f"  [API] 正在调用 LLM... (尝试 {attempt + 1}/{max_retries})")
-            response = requests.post(API_URL, headers=headers, json=payload, timeout=120)
+            response = _HTTP_SESSION.post(API_URL, headers=headers, json=payload, timeout=120)
             response.raise_for_status()
             result = response.json()
             return result['choices'][0]['message']['content'].strip()
@@ -215,7 +222,7 @@ def call_llm(prompt: str, system_prompt: str = "", temperature: float = 0.3, max
 
 def parse_json_response(response: str) -> Dict:
     """解析 LLM 返回的 JSON"""
-    json_match = re.search(r'```(?:json)?\s*(.*?)\s*```', response, re.DOTALL)
+    json_match = _JSON_BLOCK_RE.search(response)
     if json_match:
         json_str = json_match.group(1)
     else:
@@ -536,20 +543,24 @@ def batch_extract(
                 paper_path, review_path, metadata_path
             )
             
+            # 只做一次 asdict（深拷贝），单篇文件和汇总列表共用同一份 dict
+            paper_dict = asdict(paper_node)
+            review_dicts = [asdict(r) for r in review_nodes]
+            
             # 保存 paper 节点
             with open(paper_output_file, 'w', encoding='utf-8') as f:
-                json.dump(asdict(paper_node), f, ensure_ascii=False, indent=2)
+                json.dump(paper_dict, f, ensure_ascii=False, indent=2)
             print(f"💾 已保存 paper 节点: {paper_output_file}")
             
             # 保存所有 review 节点到一个文件
-            if review_nodes:
+            if review_dicts:
                 review_output_file = os.path.join(output_dir, f"{paper_id}_reviews.json")
                 with open(review_output_file, 'w', encoding='utf-8') as f:
-                    json.dump([asdict(r) for r in review_nodes], f, ensure_ascii=False, indent=2)
-                print(f"💾 已保存 {len(review_nodes)} 个 review 节点: {review_output_file}")
+                    json.dump(review_dicts, f, ensure_ascii=False, indent=2)
+                print(f"💾 已保存 {len(review_dicts)} 个 review 节点: {review_output_file}")
             
-            all_paper_nodes.append(asdict(paper_node))
-            all_review_nodes.extend([asdict(r) for r in review_nodes])
+            all_paper_nodes.append(paper_dict)
+            all_review_nodes.extend(review_dicts)
             success_count += 1
             
         except Exception as e:
@@ -39,6 +39,9 @@ if not LLM_CONFIG["auth_token"]:
     print("⚠️  警告: 未设置 LLM_AUTH_TOKEN 环境变量")
     print("   Pattern生成功能将不可用，但可以直接使用已生成的 patterns_structured.json")
 
+# 复用 TCP/TLS 连接的 HTTP Session（逐条 Embedding / LLM 调用）
+_HTTP_SESSION = requests.Session()
+
 # 聚类参数
 CLUSTER_PARAMS = {
     "distance_threshold": 0.35,  # 距离阈值
@@ -63,7 +66,7 @@ def get_embedding(text: str, max_retries: int = 3) -> List[float]:
     
     for attempt in range(max_retries):
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
+            response = _HTTP_SESSION.post(url, headers=headers, json=payload, timeout=30)
             response.raise_for_status()
             result = response.json()
             return result['data'][0]['embedding']
@@ -95,7 +98,7 @@ def call_llm(prompt: str, max_retries: int = 3) -> str:
     
     for attempt in range(max_retries):
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
+            response = _HTTP_SESSION.post(url, headers=headers, json=payload, timeout=60)
             response.raise_for_status()
             result = response.json()
             return result['choices'][0]['message']['content'].strip()
@@ -11,17 +11,16 @@ Idea2Story Pipeline - 从用户 Idea 到可发表的 Paper Story
   python scripts/idea2story_pipeline.py "你的Idea描述"
 """
 
-import json
 import sys
 
 # 导入 Pipeline 模块
 try:
-    from pipeline import Idea2StoryPipeline, OUTPUT_DIR
+    from pipeline import Idea2StoryPipeline, OUTPUT_DIR, load_json, save_json
 except ImportError:
     # 如果直接运行脚本，尝试添加当前目录到 path
     import os
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-    from pipeline import Idea2StoryPipeline, OUTPUT_DIR
+    from pipeline import Idea2StoryPipeline, OUTPUT_DIR, load_json, save_json
 
 # ===================== 主函数 =====================
 def main():
@@ -37,10 +36,8 @@ def main():
 
     try:
         # 加载节点数据
-        with open(OUTPUT_DIR / "nodes_pattern.json", 'r', encoding='utf-8') as f:
-            patterns = json.load(f)
-        with open(OUTPUT_DIR / "nodes_paper.json", 'r', encoding='utf-8') as f:
-            papers = json.load(f)
+        patterns = load_json(OUTPUT_DIR / "nodes_pattern.json")
+        papers = load_json(OUTPUT_DIR / "nodes_paper.json")
 
         print(f"  ✓ 加载 {len(patterns)} 个 Pattern")
         print(f"  ✓ 加载 {len(papers)} 个 Paper")
@@ -69,22 +66,28 @@ def main():
         # 【关键修复】加载完整的 patterns_structured.json 以合并数据
         patterns_structured_file = OUTPUT_DIR / "patterns_structured.json"
         if patterns_structured_file.exists():
-            with open(patterns_structured_file, 'r', encoding='utf-8') as f:
-                patterns_structured = json.load(f)
+            patterns_structured = load_json(patterns_structured_file)
 
-            # 构建 pattern_id -> structured_data 的映射
+            # 构建 pattern_id -> 合并所需字段 的映射（只保留召回到的 Pattern，其余记录随 patterns_structured 一起释放）
+            # 下游最多使用前 3 个 skeleton_examples（refinement 的 [:3]）
+            recalled_ids = {pattern_id for pattern_id, _, _ in recall_results}
             structured_map = {}
             for p in patterns_structured:
                 pattern_id = f"pattern_{p.get('pattern_id')}"
-                structured_map[pattern_id] = p
+                if pattern_id in recalled_ids:
+                    structured_map[pattern_id] = {
+                        'skeleton_examples': p.get('skeleton_examples', [])[:3],
+                        'common_tricks': p.get('common_tricks', []),
+                    }
+            del patterns_structured
 
             # 合并 skeleton_examples 和 common_tricks 到召回结果
             merged_results = []
             for pattern_id, pattern_info, score in recall_results:
                 merged_pattern = dict(pattern_info)
                 if pattern_id in structured_map:
-                    merged_pattern['skeleton_examples'] = structured_map[pattern_id].get('skeleton_examples', [])
-                    merged_pattern['common_tricks'] = structured_map[pattern_id].get('common_tricks', [])
+                    merged_pattern['skeleton_examples'] = structured_map[pattern_id]['skeleton_examples']
+                    merged_pattern['common_tricks'] = structured_map[pattern_id]['common_tricks']
                 merged_results.append((pattern_id, merged_pattern, score))
 
             recalled_patterns = merged_results
@@ -92,10 +95,7 @@ def main():
             # 如果没有 patterns_structured.json，直接使用召回结果
             recalled_patterns = recall_results
 
-        # 加载 papers 数据 (Pipeline 需要用于 RAG 查重)
-        print("\n  加载 Papers 数据用于查重...")
-        with open(OUTPUT_DIR / "nodes_paper.json", 'r', encoding='utf-8') as f:
-            papers = json.load(f)
+        # papers 数据 (Pipeline 需要用于 RAG 查重) 已在开头加载，直接复用，不再重复读取 nodes_paper.json
 
         # 恢复 argv
         sys.argv = original_argv
@@ -109,34 +109,32 @@ def main():
 
         # 保存结果
         output_file = OUTPUT_DIR / "final_story.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(result['final_story'], f, ensure_ascii=False, indent=2)
+        save_json(result['final_story'], output_file)
 
         print(f"\n💾 最终 Story 已保存到: {output_file}")
 
         # 保存完整结果
         full_result_file = OUTPUT_DIR / "pipeline_result.json"
-        with open(full_result_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                'user_idea': user_idea,
-                'success': result['success'],
-                'iterations': result['iterations'],
-                'selected_patterns': result['selected_patterns'],
-                'final_story': result['final_story'],
-                'review_history': result['review_history'],
-                'review_summary': {
-                    'total_reviews': len(result['review_history']),
-                    'final_score': result['review_history'][-1]['avg_score'] if result['review_history'] else 0
-                },
-                'refinement_summary': {
-                    'total_refinements': len(result['refinement_history']),
-                    'issues_addressed': [r['issue'] for r in result['refinement_history']]
-                },
-                'verification_summary': {
-                    'collision_detected': result['verification_result']['collision_detected'],
-                    'max_similarity': result['verification_result']['max_similarity']
-                }
-            }, f, ensure_ascii=False, indent=2)
+        save_json({
+            'user_idea': user_idea,
+            'success': result['success'],
+            'iterations': result['iterations'],
+            'selected_patterns': result['selected_patterns'],
+            'final_story': result['final_story'],
+            'review_history': result['review_history'],
+            'review_summary': {
+                'total_reviews': len(result['review_history']),
+                'final_score': result['review_history'][-1]['avg_score'] if result['review_history'] else 0
+            },
+            'refinement_summary': {
+                'total_refinements': len(result['refinement_history']),
+                'issues_addressed': [r['issue'] for r in result['refinement_history']]
+            },
+            'verification_summary': {
+                'collision_detected': result['verification_result']['collision_detected'],
+                'max_similarity': result['verification_result']['max_similarity']
+            }
+        }, full_result_file)
 
         print(f"💾 完整结果已保存到: {full_result_file}")
 
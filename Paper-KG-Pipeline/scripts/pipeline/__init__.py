@@ -5,7 +5,7 @@ from .pattern_selector import PatternSelector
 from .planner import StoryPlanner, create_planner
 from .refinement import RefinementEngine
 from .story_generator import StoryGenerator
-from .utils import call_llm
+from .utils import call_llm, load_json, save_json
 from .verifier import RAGVerifier
 
 __all__ = [
@@ -19,6 +19,8 @@ __all__ = [
     'RefinementEngine',
     'RAGVerifier',
     'call_llm',
+    'load_json',
+    'save_json',
     'PROJECT_ROOT',
     'OUTPUT_DIR'
 ]
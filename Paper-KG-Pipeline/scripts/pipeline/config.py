@@ -12,6 +12,13 @@ LLM_API_KEY = os.getenv("SILICONFLOW_API_KEY", "")
 LLM_API_URL = os.getenv("LLM_API_URL", "https://api.siliconflow.cn/v1/chat/completions")
 LLM_MODEL = os.getenv("LLM_MODEL", "Pro/zai-org/GLM-4.7")
 
+# ===================== LLM 响应缓存 =====================
+# temperature 不高于该阈值的调用视为近似确定，相同 prompt 直接复用响应（设为负数可关闭）
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
+# 设置 LLM_CACHE_PERSIST=1 时持久化到 output/llm_cache.jsonl，跨运行复用
+LLM_CACHE_PERSIST = os.getenv("LLM_CACHE_PERSIST", "0") == "1"
+LLM_CACHE_FILE = OUTPUT_DIR / "llm_cache.jsonl"
+
 # ===================== Pipeline 配置 =====================
 class PipelineConfig:
     """Pipeline 配置参数"""
@@ -19,10 +26,31 @@ class PipelineConfig:
     SELECT_PATTERN_COUNT = 3  # 选择 3 个不同策略的 Pattern
     CONSERVATIVE_RANK_RANGE = (0, 2)  # 稳健型: Rank 1-3
     INNOVATIVE_CLUSTER_SIZE_THRESHOLD = 10  # 创新型: Cluster Size < 10
+    MMR_LAMBDA = 0.7  # MMR 多样化: 相关性权重（1 - λ 为与已用 Pattern 相似度的惩罚权重）
+
+    # 输出详细程度（PIPELINE_VERBOSE=0 时只输出阶段摘要：不打印完整 Story、评审反馈全文和
+    # 各维度排序明细，也不再为展示额外调用 LLM 翻译中文调试版）
+    VERBOSE = os.getenv("PIPELINE_VERBOSE", "1") != "0"
+
+    # LLM 调用
+    LLM_MAX_WORKERS = 8  # 相互独立的 LLM 调用最多同时发起的请求数
+    LLM_MAX_RETRIES = 3  # 超时/连接/响应解析失败时的最大尝试次数
+    LLM_RETRY_MAX_DELAY = 30  # 指数退避的最大等待秒数
+    LLM_MIN_REQUEST_INTERVAL = float(os.getenv("LLM_MIN_REQUEST_INTERVAL", "0"))  # 相邻两次 LLM 请求的最小间隔（秒），只补足剩余时间；0 表示不限速
+    ENABLE_STREAMING = False  # True: Story 生成以流式读取，JSON 对象闭合后立即断开，不等待模型输出多余的尾部文本
+    ASYNC_STORY_TRANSLATION = True  # True: Story 中文调试版在后台线程翻译，与后续 Critic 评审重叠进行
 
     # Critic 阈值
     PASS_SCORE = 7.0  # 评分 >= 7 为通过
+    BATCH_REVIEWS = False  # True: 三个评审角色合并为一次 LLM 调用（省输入 token，解析失败时回退逐个评审）
     MAX_REFINE_ITERATIONS = 3  # 最多修正 3 轮
+    REFINE_MIN_DELTA = 0.3  # 平均分提升小于该值视为停滞
+    REFINE_PATIENCE = 2  # 连续停滞轮数达到该值时提前结束修正
+    # Story 生成温度随修正轮次递减（后期为局部修改，降低采样随机性以免丢弃已获好评的部分）
+    # 下限高于 LLM_CACHE_MAX_TEMPERATURE，避免回滚后相同输入命中缓存得到完全相同的 Story
+    STORY_TEMPERATURE = 0.7
+    STORY_TEMPERATURE_DECAY = 0.15  # 每轮修正降低的温度
+    STORY_TEMPERATURE_MIN = 0.4
 
     # 新颖性模式配置
     NOVELTY_MODE_MAX_PATTERNS = 3  # 新颖性模式最多尝试的 Pattern 数
@@ -30,6 +58,7 @@ class PipelineConfig:
 
     # RAG 查重阈值
     COLLISION_THRESHOLD = 0.75  # 相似度 > 0.75 认为撞车
+    VERIFY_PAPER_LIMIT = 50  # 查重检索的论文数量上限（演示用，None 表示检索全部论文）
 
     # Refinement 策略
     TAIL_INJECTION_RANK_RANGE = (4, 9)  # 长尾注入: Rank 5-10
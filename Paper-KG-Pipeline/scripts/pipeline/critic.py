@@ -1,10 +1,34 @@
 import re
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 from .config import PipelineConfig
 from .utils import call_llm, parse_json_from_llm
 
 
+# 预编译正则（评审响应 JSON 解析失败时的 Fallback 提取）
+_SCORE_RE = re.compile(r'(?:\"|\')?score(?:\"|\')?\s*:\s*([\d\.]+)')
+_FEEDBACK_STRICT_RE = re.compile(
+    r'(?:\"|\')?feedback(?:\"|\')?\s*:\s*"([^"\\]*(?:(?:\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})[^"\\]*)*)"',
+    re.DOTALL
+)
+_FEEDBACK_LOOSE_RE = re.compile(
+    r'(?:\"|\')?feedback(?:\"|\')?\s*:\s*"([^"]*(?:\\.[^"]*)*)"',
+    re.DOTALL
+)
+_QUOTED_VALUE_RE = re.compile(r':\s*"([^"]*(?:\\.[^"]*)*)"')
+
+# 针对 Novelty 角色的特殊指令
+NOVELTY_INSTRUCTIONS = """
+【特别注意】
+作为 Novelty 评审，你需要比较严格，不要被表面的“新颖”词汇迷惑。
+1. **批判性评估组合**：仔细思考作者提出的技术是否在近两年的 NLP/CV 顶会中已经泛滥。如果是常见的“A+B”堆砌且缺乏深层理论创新，请给出低分（4-5分）。
+2. **拒绝平庸**：如果 Story 只是将现有技术应用到新领域（如“用 BERT 做 X 任务”），而没有针对该领域的独特适配或理论贡献，这不叫创新。
+3. **直言不讳**：如果发现是常见套路，请在反馈中明确指出“这种组合已经很常见”或“缺乏实质性创新”。
+4. **高分门槛**：只有真正的范式创新、极具启发性的反直觉发现，或对现有方法的根本性改进，才能得到 8 分以上。
+"""
+
+
 class MultiAgentCritic:
     """多智能体评审团: 三个角色评审 Story"""
 
@@ -34,18 +58,29 @@ class MultiAgentCritic:
         print("🔍 Phase 3: Multi-Agent Critic (多智能体评审)")
         print("=" * 80)
 
-        reviews = []
-        scores = []
-
-        for reviewer in self.reviewers:
-            print(f"\n📝 {reviewer['name']} ({reviewer['role']}) 评审中...")
-
-            review_result = self._single_review(story, reviewer)
-            reviews.append(review_result)
-            scores.append(review_result['score'])
-
+        names = ', '.join(f"{r['name']} ({r['role']})" for r in self.reviewers)
+        reviews = None
+
+        # 合并评审：一次 LLM 调用完成三个角色的评审（Story 只发送一次）
+        if PipelineConfig.BATCH_REVIEWS:
+            print(f"\n📝 合并评审中: {names}")
+            reviews = self._batched_review(story)
+            if reviews is None:
+                print("   ⚠️  合并评审解析失败，回退到逐个评审")
+
+        # 三位评审员相互独立，并发调用 LLM（耗时取决于最慢的一位而非三者之和）
+        if reviews is None:
+            print(f"\n📝 并发评审中: {names}")
+            with ThreadPoolExecutor(max_workers=len(self.reviewers)) as executor:
+                reviews = list(executor.map(lambda r: self._single_review(story, r), self.reviewers))
+        scores = [review_result['score'] for review_result in reviews]
+
+        # 按评审员顺序输出结果
+        for reviewer, review_result in zip(self.reviewers, reviews):
+            print(f"\n📝 {reviewer['name']} ({reviewer['role']})")
             print(f"   评分: {review_result['score']:.1f}/10")
-            print(f"   反馈: {review_result['feedback']}")
+            if PipelineConfig.VERBOSE:
+                print(f"   反馈: {review_result['feedback']}")
 
         # 计算平均分
         avg_score = sum(scores) / len(scores)
@@ -69,20 +104,96 @@ class MultiAgentCritic:
             'suggestions': suggestions
         }
 
+    @staticmethod
+    def _format_story(story: Dict) -> str:
+        """Story 各字段拼成评审 Prompt 中的正文"""
+        return f"""【标题】{story.get('title', '')}
+
+【摘要】{story.get('abstract', '')}
+
+【问题定义】{story.get('problem_definition', '')}
+
+【方法概述】{story.get('method_skeleton', '')}
+
+【贡献点】
+{chr(10).join([f"  - {claim}" for claim in story.get('innovation_claims', [])])}
+
+【实验计划】{story.get('experiments_plan', '')}"""
+
+    def _batched_review(self, story: Dict) -> Optional[List[Dict]]:
+        """三个角色合并为一次 LLM 调用评审
+
+        Returns:
+            与 self.reviewers 顺序一致的评审结果；响应缺少任一角色时返回 None
+        """
+        roles_text = "\n".join(
+            f"- {r['name']}（{r['role']}）：专注于评估{r['focus']}" for r in self.reviewers
+        )
+        output_example = ",\n".join(
+            f'    {{"reviewer": "{r["name"]}", "score": 6.5, '
+            f'"feedback": "1. 维度A (6.0分): 理由...\\n2. 维度B (7.0分): 理由...\\n\\n总结: ..."}}'
+            for r in self.reviewers
+        )
+
+        prompt = f"""
+你将分别扮演顶级 NLP 会议（如 ACL/ICLR）的以下几位**严厉评审专家**，各自独立评审同一篇论文 Story：
+{roles_text}
+
+每位评审的打分标准都非常严格，满分 10 分。6 分以下为不及格（Reject），8 分以上为优秀（Accept）。
+各评审只从自己负责的角度评审，互不参考彼此的分数。
+
+Novelty 评审的额外要求：
+{NOVELTY_INSTRUCTIONS}
+请评审以下论文 Story：
+
+{self._format_story(story)}
+
+【评审要求】（每位评审分别遵守）
+1. 请列出 3 个具体的评估维度。
+2. **对每个维度进行打分（1-10分）**，并给出理由。
+3. **最终总分（score）必须是各维度分数的综合评估，严禁出现细项分低但总分高的情况。**
+4. 如果发现明显缺陷（如创新性不足、方法不合理），请给出低分（<6分）。
+
+输出格式（JSON，reviews 中每位评审一项）：
+{{
+  "reviews": [
+{output_example}
+  ]
+}}
+"""
+
+        response = call_llm(prompt, temperature=0.3, max_tokens=1800, timeout=180)
+        result = parse_json_from_llm(response)
+        if not result or not isinstance(result.get('reviews'), list):
+            return None
+
+        by_name = {}
+        for item in result['reviews']:
+            if isinstance(item, dict) and item.get('reviewer'):
+                by_name.setdefault(item['reviewer'], item)
+
+        reviews = []
+        for reviewer in self.reviewers:
+            item = by_name.get(reviewer['name'])
+            if item is None:
+                return None
+            try:
+                score = float(item.get('score', 5.0))
+            except (TypeError, ValueError):
+                return None
+            reviews.append({
+                'reviewer': reviewer['name'],
+                'role': reviewer['role'],
+                'score': score,
+                'feedback': item.get('feedback', '')
+            })
+        return reviews
+
     def _single_review(self, story: Dict, reviewer: Dict) -> Dict:
         """单个评审员评审"""
 
         # 针对 Novelty 角色的特殊指令
-        special_instructions = ""
-        if reviewer['role'] == 'Novelty':
-            special_instructions = """
-【特别注意】
-作为 Novelty 评审，你需要比较严格，不要被表面的“新颖”词汇迷惑。
-1. **批判性评估组合**：仔细思考作者提出的技术是否在近两年的 NLP/CV 顶会中已经泛滥。如果是常见的“A+B”堆砌且缺乏深层理论创新，请给出低分（4-5分）。
-2. **拒绝平庸**：如果 Story 只是将现有技术应用到新领域（如“用 BERT 做 X 任务”），而没有针对该领域的独特适配或理论贡献，这不叫创新。
-3. **直言不讳**：如果发现是常见套路，请在反馈中明确指出“这种组合已经很常见”或“缺乏实质性创新”。
-4. **高分门槛**：只有真正的范式创新、极具启发性的反直觉发现，或对现有方法的根本性改进，才能得到 8 分以上。
-"""
+        special_instructions = NOVELTY_INSTRUCTIONS if reviewer['role'] == 'Novelty' else ""
 
         # 构建 Prompt
         prompt = f"""
@@ -91,18 +202,7 @@ class MultiAgentCritic:
 {special_instructions}
 请评审以下论文 Story：
 
-【标题】{story.get('title', '')}
-
-【摘要】{story.get('abstract', '')}
-
-【问题定义】{story.get('problem_definition', '')}
-
-【方法概述】{story.get('method_skeleton', '')}
-
-【贡献点】
-{chr(10).join([f"  - {claim}" for claim in story.get('innovation_claims', [])])}
-
-【实验计划】{story.get('experiments_plan', '')}
+{self._format_story(story)}
 
 请从{reviewer['focus']}的角度进行评审。
 
@@ -139,7 +239,7 @@ class MultiAgentCritic:
         feedback = "评审意见解析失败，请查看原始输出"
 
         # 尝试匹配分数 "score": 7.5 或 score: 7.5
-        score_match = re.search(r'(?:\"|\')?score(?:\"|\')?\s*:\s*([\d\.]+)', response)
+        score_match = _SCORE_RE.search(response)
         if score_match:
             try:
                 score = float(score_match.group(1))
@@ -149,11 +249,7 @@ class MultiAgentCritic:
 
         # 尝试提取 feedback 字段（更加健壮）
         # 方法1: 匹配 "feedback": "..."
-        feedback_match = re.search(
-            r'(?:\"|\')?feedback(?:\"|\')?\s*:\s*"((?:[^"\\]|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*)"',
-            response,
-            re.DOTALL
-        )
+        feedback_match = _FEEDBACK_STRICT_RE.search(response)
         if feedback_match:
             feedback = feedback_match.group(1)
             feedback = feedback.replace('\\"', '"')
@@ -161,11 +257,7 @@ class MultiAgentCritic:
             print(f"      💬 从响应中提取 feedback（模式1）")
         else:
             # 方法2: 更宽松的匹配
-            feedback_match = re.search(
-                r'(?:\"|\')?feedback(?:\"|\')?\s*:\s*"([^"]*(?:\\.[^"]*)*)"',
-                response,
-                re.DOTALL
-            )
+            feedback_match = _FEEDBACK_LOOSE_RE.search(response)
             if feedback_match:
                 feedback = feedback_match.group(1)
                 feedback = feedback.replace('\\"', '"')
@@ -173,7 +265,7 @@ class MultiAgentCritic:
                 print(f"      💬 从响应中提取 feedback（模式2）")
             else:
                 # 方法3: 如果还是失败，尝试找到所有冒号后的内容，取最长的
-                content_matches = list(re.finditer(r':\s*"([^"]*(?:\\.[^"]*)*)"', response))
+                content_matches = list(_QUOTED_VALUE_RE.finditer(response))
                 if len(content_matches) >= 2:
                     # 假设 score 是第一个，feedback 是第二个
                     feedback = content_matches[1].group(1)
@@ -1,4 +1,3 @@
-import time
 from typing import Dict, List, Tuple
 
 from .config import PipelineConfig
@@ -94,6 +93,9 @@ class Idea2StoryPipeline:
         global_best_critic_result = None  # 对应的Critic结果
         global_best_iteration = 0  # 对应的迭代轮次
 
+        # 【新增】平均分停滞检测（提前结束无效修正）
+        plateau_rounds = 0  # 连续停滞轮数
+
         # Phase 2: Initial Story Generation (初始生成)
         current_story = self.story_generator.generate(
             pattern_id, pattern_info, constraints, injected_tricks
@@ -175,6 +177,15 @@ class Idea2StoryPipeline:
                 print("\n✅ 评审通过，进入查重验证阶段")
                 break
 
+            # 【新增】平均分停滞检测：连续多轮提升不足时，继续修正大概率无效，提前结束
+            if not novelty_mode_active and len(review_history) >= 2:
+                delta = review_history[-1]['avg_score'] - review_history[-2]['avg_score']
+                plateau_rounds = plateau_rounds + 1 if delta < PipelineConfig.REFINE_MIN_DELTA else 0
+                if plateau_rounds >= PipelineConfig.REFINE_PATIENCE:
+                    print(f"\n🛑 提前结束修正: 连续 {plateau_rounds} 轮平均分提升不足 "
+                          f"(delta={delta:.2f} < {PipelineConfig.REFINE_MIN_DELTA})")
+                    break
+
             # Phase 3.5: Refinement
             print(f"\n❌ 评审未通过 (平均分: {critic_result['avg_score']:.2f})")
 
@@ -241,7 +252,6 @@ class Idea2StoryPipeline:
             last_issue_type = main_issue
 
             print(f"\n🔄 准备重新生成 Story（迭代 {novelty_mode_base_iteration if novelty_mode_active else iterations + 1}）...\n")
-            time.sleep(1)  # 短暂延迟
 
             # 判断是否发生了 Pattern 强制切换
             # 如果发生了切换，则视为重新生成（previous_story=None）
@@ -267,7 +277,8 @@ class Idea2StoryPipeline:
                     previous_story=current_story,
                     review_feedback=critic_result,
                     new_tricks_only=new_tricks,
-                    fused_idea=fused_idea  # 传入融合后的概念级创新 idea
+                    fused_idea=fused_idea,  # 传入融合后的概念级创新 idea
+                    iteration=iterations
                 )
 
             # 【新增】生成后反思：评估融合质量（仅在融合发生时）
@@ -315,7 +326,8 @@ class Idea2StoryPipeline:
                     previous_story=new_story,  # 基于初稿进行改进
                     review_feedback=critic_result,
                     fused_idea=fused_idea,
-                    reflection_guidance=fusion_suggestions  # 传入Reflection建议
+                    reflection_guidance=fusion_suggestions,  # 传入Reflection建议
+                    iteration=iterations
                 )
 
                 print(f"   ✅ Story终稿已根据Reflection建议生成")
@@ -430,11 +442,16 @@ class Idea2StoryPipeline:
             )
 
             # 重新生成（使用 novelty 或 domain_distance 维度的 Pattern）
+            # MMR 重排：避免切换到与撞车版本所用 Pattern 相同或高度相似的 Pattern
             if ranked_patterns.get('novelty') and len(ranked_patterns['novelty']) > 0:
-                pattern_id, pattern_info, metadata = ranked_patterns['novelty'][0]
+                pattern_id, pattern_info, metadata = (self.pattern_selector.mmr_rerank(
+                    ranked_patterns['novelty'], [pattern_id]
+                ) or ranked_patterns['novelty'])[0]
                 print(f"\n🔄 切换到新颖度维度 Pattern: {pattern_id}")
             elif ranked_patterns.get('domain_distance') and len(ranked_patterns['domain_distance']) > 0:
-                pattern_id, pattern_info, metadata = ranked_patterns['domain_distance'][0]
+                pattern_id, pattern_info, metadata = (self.pattern_selector.mmr_rerank(
+                    ranked_patterns['domain_distance'], [pattern_id]
+                ) or ranked_patterns['domain_distance'])[0]
                 print(f"\n🔄 切换到领域距离维度 Pattern: {pattern_id}")
 
             final_story = self.story_generator.generate(
@@ -444,6 +461,9 @@ class Idea2StoryPipeline:
             # 重新查重
             verification_result = self.verifier.verify(final_story)
 
+        # 等待后台的中文调试版翻译输出完毕
+        self.story_generator.wait_for_translations()
+
         # 输出最终结果
         success = verification_result['pass']
 
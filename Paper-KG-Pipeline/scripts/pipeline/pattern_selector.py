@@ -1,5 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Optional
 
+import numpy as np
+
 from .config import PipelineConfig
 from .utils import call_llm, parse_json_from_llm
 
@@ -17,6 +20,12 @@ class PatternSelector:
         self.user_idea = user_idea
         self.pattern_classifications = {}  # 存储 LLM 分类结果
 
+        # pattern_id -> recalled_patterns 下标（重复 id 取首个），校准示例与 MMR 查找用
+        self._pattern_index: Dict[str, int] = {}
+        for i, (pid, _, _) in enumerate(recalled_patterns):
+            self._pattern_index.setdefault(pid, i)
+        self._pattern_tokens: Dict[str, frozenset] = {}  # MMR 用的 Pattern 词集合（按需计算）
+
     def select(self) -> Dict[str, List[Tuple[str, Dict, Dict]]]:
         """选择多个 Pattern 并按三个维度（稳健度、新颖度、跨域度）分别排序
 
@@ -55,6 +64,9 @@ class PatternSelector:
                 continue
 
             print(f"\n{dimension_names.get(dimension, dimension)} 共 {len(patterns)} 个:")
+            if not PipelineConfig.VERBOSE:
+                print(f"  Top-1: {patterns[0][0]}")
+                continue
             for i, (pid, pinfo, meta) in enumerate(patterns[:5], 1):  # 显示前5个
                 print(f"  {i}. {pid}")
                 print(f"     名称: {pinfo.get('name', 'N/A')}")
@@ -73,34 +85,55 @@ class PatternSelector:
         return ranked
 
     def _score_patterns_multidimensional(self):
-        """为所有 Pattern 计算三个维度的得分（稳健度、新颖度、跨域度）"""
+        """为所有 Pattern 计算三个维度的得分（稳健度、新颖度、跨域度）
+
+        评分 Prompt 以最先评分的 3 个 Pattern 作为校准参考，因此前 3 个按顺序评分；
+        之后的 Pattern 校准参考固定不变、彼此独立，并发调用 LLM
+        """
         # 对 Top-20 进行 LLM 评分（平衡效果和成本）
         top_patterns = self.recalled_patterns[:20]
+        n_calibration = 3
 
-        for pattern_id, pattern_info, recall_score in top_patterns:
-            # 构建 Pattern 摘要信息
-            pattern_name = pattern_info.get('name', '')
-            pattern_size = pattern_info.get('size', 0)
+        for pattern_id, pattern_info, _ in top_patterns[:n_calibration]:
+            self._record_pattern_scores(pattern_id, self._score_single_pattern(pattern_id, pattern_info))
 
-            summary = pattern_info.get('summary', {})
-            if isinstance(summary, dict):
-                representative_ideas = summary.get('representative_ideas', [])[:3]
-                common_problems = summary.get('common_problems', [])[:2]
-            else:
-                representative_ideas = []
-                common_problems = []
+        rest = top_patterns[n_calibration:]
+        if not rest:
+            return
 
-            # 调用 LLM 进行多维度评分
-            scores = self._call_llm_for_multidim_scoring(
-                pattern_id, pattern_name, pattern_size,
-                representative_ideas, common_problems
-            )
+        with ThreadPoolExecutor(max_workers=PipelineConfig.LLM_MAX_WORKERS) as executor:
+            results = list(executor.map(lambda p: self._score_single_pattern(p[0], p[1]), rest))
 
-            if scores:
-                self.pattern_classifications[pattern_id] = scores
-                print(f"  ✓ {pattern_id}: 稳健={scores.get('stability_score', 0):.2f}, "
-                      f"新颖={scores.get('novelty_score', 0):.2f}, "
-                      f"域距={scores.get('domain_distance', 0):.2f}")
+        # 按原顺序记录，保持 pattern_classifications 的插入顺序
+        for (pattern_id, _, _), scores in zip(rest, results):
+            self._record_pattern_scores(pattern_id, scores)
+
+    def _score_single_pattern(self, pattern_id: str, pattern_info: Dict) -> Optional[Dict]:
+        """为单个 Pattern 构建摘要并调用 LLM 评分"""
+        pattern_name = pattern_info.get('name', '')
+        pattern_size = pattern_info.get('size', 0)
+
+        summary = pattern_info.get('summary', {})
+        if isinstance(summary, dict):
+            representative_ideas = summary.get('representative_ideas', [])[:3]
+            common_problems = summary.get('common_problems', [])[:2]
+        else:
+            representative_ideas = []
+            common_problems = []
+
+        # 调用 LLM 进行多维度评分
+        return self._call_llm_for_multidim_scoring(
+            pattern_id, pattern_name, pattern_size,
+            representative_ideas, common_problems
+        )
+
+    def _record_pattern_scores(self, pattern_id: str, scores: Optional[Dict]):
+        """记录单个 Pattern 的评分结果"""
+        if scores:
+            self.pattern_classifications[pattern_id] = scores
+            print(f"  ✓ {pattern_id}: 稳健={scores.get('stability_score', 0):.2f}, "
+                  f"新颖={scores.get('novelty_score', 0):.2f}, "
+                  f"域距={scores.get('domain_distance', 0):.2f}")
 
     def _generate_reference_examples(self, current_pattern_id: str) -> str:
         """生成参考示例来校准 LLM 评分，基于已评分的 Pattern"""
@@ -124,7 +157,8 @@ Example 3 - MEDIUM novelty, MEDIUM stability (Size 60):
             # 从已评分中提取几个代表性样本
             samples = []
             for pid, scores in list(self.pattern_classifications.items())[:3]:
-                pinfo = next((p[1] for p in self.recalled_patterns if p[0] == pid), {})
+                idx = self._pattern_index.get(pid)
+                pinfo = self.recalled_patterns[idx][1] if idx is not None else {}
                 samples.append(f"  {pid} (Size {pinfo.get('size', '?')}): "
                              f"stability={scores.get('stability_score', 0):.2f}, "
                              f"novelty={scores.get('novelty_score', 0):.2f}")
@@ -305,6 +339,65 @@ Consider semantic and methodological distance, not just application domain.
             'reasoning': f'Rule-based: size={pattern_size}'
         }
 
+    def mmr_rerank(self, candidates: List[Tuple[str, Dict, Dict]], picked_ids: List[str],
+                   k: int = 1, lam: Optional[float] = None) -> List[Tuple[str, Dict, Dict]]:
+        """MMR 重排：从已按某一维度排好序的候选中依次选出 k 个，兼顾排名与差异性
+
+        每步选择 argmax(λ * 相关性 - (1 - λ) * max 与已选 Pattern 的相似度)，
+        相关性取候选在该维度中的名次（第 1 名为 1.0），相似度为 Pattern 文本的 Jaccard 相似度。
+        没有已选 Pattern 时第一个选择即原排序的第 1 名
+        """
+        if lam is None:
+            lam = PipelineConfig.MMR_LAMBDA
+        n = len(candidates)
+        if n == 0 or k <= 0:
+            return []
+
+        relevance = 1.0 - np.arange(n, dtype=np.float64) / n
+        picked_tokens = [self._tokens_for(pid) for pid in picked_ids]
+        max_sim = np.array([
+            max((self._jaccard(self._tokens_for(pid, pinfo), t) for t in picked_tokens), default=0.0)
+            for pid, pinfo, _ in candidates
+        ])
+        available = np.array([pid not in picked_ids for pid, _, _ in candidates])
+
+        selected = []
+        for _ in range(min(k, n)):
+            mmr = np.where(available, lam * relevance - (1 - lam) * max_sim, -np.inf)
+            if not np.isfinite(mmr).any():
+                break
+            idx = int(mmr.argmax())
+            selected.append(candidates[idx])
+            available[idx] = False
+            chosen = self._tokens_for(candidates[idx][0], candidates[idx][1])
+            max_sim = np.maximum(max_sim, [
+                self._jaccard(self._tokens_for(pid, pinfo), chosen) for pid, pinfo, _ in candidates
+            ])
+        return selected
+
+    def _tokens_for(self, pattern_id: str, pattern_info: Optional[Dict] = None) -> frozenset:
+        """Pattern 名称 + 代表性想法 + 解决方案 的小写词集合（带缓存）"""
+        tokens = self._pattern_tokens.get(pattern_id)
+        if tokens is None:
+            if pattern_info is None:
+                idx = self._pattern_index.get(pattern_id)
+                pattern_info = self.recalled_patterns[idx][1] if idx is not None else {}
+            parts = [pattern_info.get('name', '')]
+            summary = pattern_info.get('summary', {})
+            if isinstance(summary, dict):
+                for key in ('representative_ideas', 'solution_approaches'):
+                    value = summary.get(key, [])
+                    parts.extend(value if isinstance(value, list) else [value])
+            tokens = frozenset(' '.join(str(p) for p in parts if p).lower().split())
+            self._pattern_tokens[pattern_id] = tokens
+        return tokens
+
+    @staticmethod
+    def _jaccard(a: frozenset, b: frozenset) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
     # 保留旧方法以兼容旧代码（标记为 deprecated）
     def _select_conservative(self) -> Optional[Tuple[str, Dict]]:
         """【已弃用】选择稳健型: Score 最高"""
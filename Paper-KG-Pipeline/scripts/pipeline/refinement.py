@@ -1,3 +1,4 @@
+import re
 from typing import List, Tuple, Dict, Optional
 
 from .config import PipelineConfig
@@ -13,6 +14,8 @@ class RefinementEngine:
         "可视化", "Attention 可视化", "参数敏感性分析", "鲁棒性测试",
         "现有方法局限性", "逻辑递进", "叙事结构", "性能提升", "实验验证"
     ]
+    # 通用 Trick 的单遍匹配：预编译为一个交替正则，每个 Trick 名只需扫描一次
+    _GENERIC_TRICKS_RE = re.compile('|'.join(map(re.escape, GENERIC_TRICKS)))
 
     def __init__(self, recalled_patterns: List[Tuple[str, Dict, float]],
                  ranked_patterns: Dict[str, List[Tuple[str, Dict, Dict]]] = None,
@@ -30,6 +33,11 @@ class RefinementEngine:
         self.user_idea = user_idea
         self.fusion_engine = IdeaFusionEngine()
 
+        # 按 Cluster Size 预排序的召回下标（稳定排序，并列时保持召回顺序），各轮注入时只需顺序扫描
+        n = len(recalled_patterns)
+        self._by_size_asc = sorted(range(n), key=lambda i: recalled_patterns[i][1].get('size', 999))
+        self._by_size_desc = sorted(range(n), key=lambda i: recalled_patterns[i][1].get('size', 0), reverse=True)
+
         # 【新增】回滚机制相关
         self.current_pattern_id = None  # 记录当前使用的 pattern_id
         self.pattern_failure_map = {}  # {pattern_id: {issue_type1, issue_type2, ...}}
@@ -220,39 +228,30 @@ class RefinementEngine:
 
             print("   ⚠️  novelty 维度中的所有 Pattern 已用完，回退到传统方法")
 
-        # 【Fallback】传统方法：筛选候选 Pattern
+        # 【Fallback】传统方法：在 Rank 范围内选择未使用、聚类最小的长尾 Pattern
+        # （按 Cluster Size 升序扫描，第一个满足条件的即为最小者）
         start, end = PipelineConfig.TAIL_INJECTION_RANK_RANGE
-        candidates = []
-
-        for i in range(start, min(end + 1, len(self.recalled_patterns))):
-            pattern_id, pattern_info, score = self.recalled_patterns[i]
-            # 避免重复使用已使用过的 Pattern
-            if pattern_id in self.used_patterns:
-                continue
-            size = pattern_info.get('size', 999)
-
-            if size < PipelineConfig.INNOVATIVE_CLUSTER_SIZE_THRESHOLD:
-                candidates.append((pattern_id, pattern_info, size))
-
-        if not candidates:
+        selected = next((
+            i for i in self._by_size_asc
+            if start <= i <= end
+            and self.recalled_patterns[i][0] not in self.used_patterns
+            and self.recalled_patterns[i][1].get('size', 999) < PipelineConfig.INNOVATIVE_CLUSTER_SIZE_THRESHOLD
+        ), None)
+
+        if selected is None:
             print("   ⚠️  未找到符合条件的长尾 Pattern，尝试放宽条件...")
             # 放宽条件：在所有召回中找未使用的、聚类最小的
-            candidates = [
-                (pid, pinfo, pinfo.get('size', 999))
-                for pid, pinfo, _ in self.recalled_patterns
-                if pid not in self.used_patterns
-            ]
-            candidates.sort(key=lambda x: x[2])
+            selected = next((
+                i for i in self._by_size_asc
+                if self.recalled_patterns[i][0] not in self.used_patterns
+            ), None)
 
-        if not candidates:
+        if selected is None:
             print("   ⚠️  所有召回 Pattern 已用尽，注入通用创新算子")
             return ["引入对比学习负采样优化策略", "设计多尺度特征融合机制", "添加自适应动态权重分配"]
 
-        # 选择 Cluster Size 最小的
-        candidates.sort(key=lambda x: x[2])
-        selected_pattern = candidates[0]
-
-        pattern_id, pattern_info, size = selected_pattern
+        pattern_id, pattern_info, _ = self.recalled_patterns[selected]
+        size = pattern_info.get('size', 999)
         # 记录已使用的 Pattern
         self.used_patterns.add(pattern_id)
 
@@ -301,7 +300,7 @@ class RefinementEngine:
             else:
                 trick_name = str(trick)
             # 过滤通用 Trick
-            is_generic = any(gt in trick_name for gt in self.GENERIC_TRICKS)
+            is_generic = self._GENERIC_TRICKS_RE.search(trick_name) is not None
             if is_generic:
                 continue
             tech_tricks.append(trick_name)
@@ -359,23 +358,19 @@ class RefinementEngine:
                 candidates.append((pattern_id, pattern_info, size))
 
         if not candidates:
-            # 如果没有符合条件的，选择 Cluster Size 最大的（且未使用过）
-            candidates = [
-                (pid, pinfo, pinfo.get('size', 0))
-                for i, (pid, pinfo, _) in enumerate(self.recalled_patterns[:3])
-                if pid not in self.used_patterns
-            ]
-            candidates.sort(key=lambda x: x[2], reverse=True)
-
-        if not candidates:
-            # 如果所有头部 Pattern 都用过了，从中间范围选择
-            print("   ⚠️  头部 Pattern 已用完，尝试中间范围...")
-            candidates = [
-                (pid, pinfo, pinfo.get('size', 0))
-                for i, (pid, pinfo, _) in enumerate(self.recalled_patterns[3:6])
-                if pid not in self.used_patterns
-            ]
-            candidates.sort(key=lambda x: x[2], reverse=True)
+            # 如果没有符合条件的，选择 Cluster Size 最大的（且未使用过）；所有头部 Pattern 都用过时从中间范围选择
+            # （按 Cluster Size 降序扫描，第一个满足条件的即为最大者）
+            for lo, hi in ((0, 3), (3, 6)):
+                if lo > 0:
+                    print("   ⚠️  头部 Pattern 已用完，尝试中间范围...")
+                selected = next((
+                    i for i in self._by_size_desc
+                    if lo <= i < hi and self.recalled_patterns[i][0] not in self.used_patterns
+                ), None)
+                if selected is not None:
+                    pid, pinfo, _ = self.recalled_patterns[selected]
+                    candidates = [(pid, pinfo, pinfo.get('size', 0))]
+                    break
 
         if not candidates:
             print("   ⚠️  未找到符合条件的头部 Pattern")
@@ -444,7 +439,7 @@ class RefinementEngine:
             else:
                 trick_name = str(trick)
             # 过滤通用 Trick
-            is_generic = any(gt in trick_name for gt in self.GENERIC_TRICKS)
+            is_generic = self._GENERIC_TRICKS_RE.search(trick_name) is not None
             if is_generic:
                 continue
             tech_tricks.append(trick_name)
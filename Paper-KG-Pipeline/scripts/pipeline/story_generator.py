@@ -1,15 +1,85 @@
 import json
 import re
-from typing import Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
+from .config import PipelineConfig
 from .utils import call_llm, parse_json_from_llm
 
+# 预编译正则（Story 响应 JSON 解析失败时的 Fallback 提取）
+_JSON_STRING_ITEM_RE = re.compile(r'"([^"\\]*(?:(?:\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})[^"\\]*)*)"')
+
+
+# 修正模式下 LLM 误把字段名当作 claim 输出时的无效值
+_INVALID_CLAIM_TOKENS = frozenset({'novelty', 'specific_contributions', 'innovative_points'})
+
+# Pattern 摘要中每条条目的最大字符数（摘要多为模板化描述，截断以控制输入 token）
+SUMMARY_ITEM_MAX_CHARS = 300
+
+# 初次生成的固定指令：与 Idea/Pattern 无关，作为 system 消息发送，多次生成共享同一前缀（可命中服务端前缀缓存）
+GENERATION_SYSTEM_PROMPT = """
+You are a senior paper author at a top AI conference. Generate a structured paper story based on the user's idea and writing template.
+
+⚠️ 【CRITICAL: User Idea Protection Rules】
+1. **The Core Concepts of the User Idea are the PROTAGONISTS** of your story. They must appear in the title, abstract, problem_framing, gap_pattern, and all innovation claims.
+2. **Pattern's techniques are TOOLS, NOT the hero**: The writing template provides technical approaches (e.g., RL, neural models) as "means to implement the user's core concepts". They should NEVER become the main focus.
+3. **Title & Abstract must highlight Core Concepts**: Technical terms can only appear as modifiers (e.g., "Self-Evolution of Agents via X" ✅, "X-based Framework" ❌).
+4. **Method serves Core Concepts**: method_skeleton should describe "how to use Pattern's techniques to realize the user's core concepts", not list technique names.
+
+【How to Use the Writing Template】
+- 【Solution Approaches】: concrete technical methods to implement the User Idea. Adapt them into method_skeleton, always as "means to realize [Core Concept]".
+- 【Story Packaging Strategy】: the "Reframe X as Y" narrative pattern. Use it to position technical solutions as TRANSFORMATIVE INSIGHTS in problem_framing, gap_pattern and innovation_claims.
+- 【参考论文的包装策略】: how real papers package problem, gap and method. Learn the FLOW: problem → gap → solution → transformation.
+- 【必须融合的技巧】: if provided, integrate them as additional means to realize Core Concepts, not simple stacking.
+
+Output Fields (ALL IN ENGLISH):
+1. title: MUST highlight Core Concepts (e.g., "Self-Evolution of Agents via Reflection and Memory"); technique names only as modifiers
+2. abstract: 150-200 words. Start with the User Idea vision, then describe the technical realization
+3. problem_framing: 100-150 words. "Reframe [Core Concept] from X to Y"
+4. gap_pattern: 100-150 words. "Current methods for [Core Concept] fail because..."
+5. solution: 150-200 words. Narrative description of the overall methodology, emphasizing how solution approaches serve Core Concepts (more descriptive than method_skeleton)
+6. method_skeleton: 3-5 concrete implementation steps from 【Solution Approaches】, separated by semicolons
+7. innovation_claims: 3 contribution points (list), each using the "Transform/Reframe" pattern: mention Core Concept + describe transformation + specify technical means + show benefit
+  * Good example: "Transform agent self-evolution from passive RL training to an active reflection-memory paradigm by integrating episodic memory with self-assessment mechanisms, enabling autonomous improvement"
+  * Bad example: "Propose a novel state-space model architecture" (technique-focused, not idea-focused)
+8. experiments_plan: 50-80 words
+
+Output Format (pure JSON, no other text):
+{
+  "title": "...",
+  "abstract": "...",
+  "problem_framing": "...",
+  "gap_pattern": "...",
+  "solution": "...",
+  "method_skeleton": "Step 1; Step 2; Step 3...",
+  "innovation_claims": ["Contribution 1", "Contribution 2", "Contribution 3"],
+  "experiments_plan": "..."
+}
+
+⚠️ LANGUAGE REQUIREMENT: Output ENTIRELY IN ENGLISH. No Chinese characters allowed.
+"""
+
+
+@lru_cache(maxsize=16)
+def _field_patterns(key: str) -> Tuple[re.Pattern, re.Pattern, re.Pattern]:
+    """按字段名编译 Fallback 正则：(严格字符串, 宽松字符串, 列表)"""
+    k = re.escape(key)
+    return (
+        re.compile(r'"' + k + r'"\s*:\s*"([^"\\]*(?:(?:\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})[^"\\]*)*)"', re.DOTALL),
+        re.compile(r'"' + k + r'"\s*:\s*"([^"]*(?:\\.[^"]*)*)"', re.DOTALL),
+        re.compile(r'"' + k + r'"\s*:\s*\[(.*?)\]', re.DOTALL),
+    )
+
 
 class StoryGenerator:
     """Story 生成器: 基于 Idea + Pattern 生成结构化 Story"""
 
     def __init__(self, user_idea: str):
         self.user_idea = user_idea
+        # 中文调试版翻译只用于展示，不影响主流程，可在后台线程进行
+        self._translation_executor: Optional[ThreadPoolExecutor] = None
+        self._pending_translations: List[Future] = []
 
     def generate(self, pattern_id: str, pattern_info: Dict,
                  constraints: Optional[List[str]] = None,
@@ -18,8 +88,12 @@ class StoryGenerator:
                  review_feedback: Optional[Dict] = None,
                  new_tricks_only: Optional[List[str]] = None,
                  fused_idea: Optional[Dict] = None,
-                 reflection_guidance: Optional[Dict] = None) -> Dict:
-        """生成 Story (支持初次生成和增量修正，支持 idea fusion 和 reflection 指导)"""
+                 reflection_guidance: Optional[Dict] = None,
+                 iteration: int = 0) -> Dict:
+        """生成 Story (支持初次生成和增量修正，支持 idea fusion 和 reflection 指导)
+
+        iteration: 当前修正轮次（0 为初次生成），用于逐轮降低生成温度
+        """
 
         # 模式判断：如果有上一轮 Story 和反馈，进入【增量修正模式】
         if previous_story and review_feedback:
@@ -35,6 +109,7 @@ class StoryGenerator:
             prompt = self._build_refinement_prompt(
                 previous_story, review_feedback, new_tricks_only, pattern_info, fused_idea, reflection_guidance
             )
+            system_prompt = self._build_refinement_system_prompt()
         else:
             # 【初次生成模式】
             print(f"\n📝 生成 Story (基于 {pattern_id})")
@@ -56,11 +131,15 @@ class StoryGenerator:
             prompt = self._build_generation_prompt(
                 pattern_info, constraints, injected_tricks
             )
+            system_prompt = GENERATION_SYSTEM_PROMPT
 
         # 调用 LLM 生成
         print("   ⏳ 调用 LLM 生成...")
         # 使用更长的超时时间（180 秒）以应对长 Prompt 和网络延迟
-        response = call_llm(prompt, temperature=0.7, max_tokens=1500, timeout=180)
+        temperature = max(PipelineConfig.STORY_TEMPERATURE_MIN,
+                          PipelineConfig.STORY_TEMPERATURE - PipelineConfig.STORY_TEMPERATURE_DECAY * iteration)
+        response = call_llm(prompt, temperature=temperature, max_tokens=1500, timeout=180, system_prompt=system_prompt,
+                            stream=PipelineConfig.ENABLE_STREAMING)
 
         # 解析输出
         story = self._parse_story_response(response)
@@ -81,8 +160,8 @@ class StoryGenerator:
             # 特殊处理 innovation_claims：如果不是列表或内容异常，恢复
             if not isinstance(story.get('innovation_claims'), list) or \
                len(story.get('innovation_claims', [])) == 0 or \
-               any(claim in ['novelty', 'specific_contributions', 'innovative_points']
-                   for claim in story.get('innovation_claims', [])):
+               not _INVALID_CLAIM_TOKENS.isdisjoint(
+                   claim for claim in story['innovation_claims'] if isinstance(claim, str)):
                 story['innovation_claims'] = previous_story.get('innovation_claims', [])
                 print(f"   ⚠️  innovation_claims 异常，已从上一版本恢复")
 
@@ -119,13 +198,89 @@ class StoryGenerator:
 
         return guidance
 
+    def _build_refinement_system_prompt(self) -> str:
+        """构建增量修正的 System Prompt
+
+        只包含与本轮 Story/反馈无关的固定规则（同一 user_idea 下每轮修正完全相同），
+        放在 system 消息中作为公共前缀，多轮修正可命中服务端的前缀缓存
+        """
+        # 提取用户Idea核心概念
+        user_idea_reminder = f"\n【User's Original Idea - THE PROTAGONIST】\n\"{self.user_idea}\"\n\nCore Concepts to Preserve: [Identify 2-4 key concepts from the idea above]\n"
+
+        return f"""
+You are a senior paper author at a top AI conference, skilled in deeply integrating new techniques into existing methods to form innovative technical combinations.
+
+{user_idea_reminder}
+
+⚠️ 【CRITICAL: User Idea Protection Rules During Refinement】
+When refining, ALWAYS remember:
+1. The user's core idea is "{self.user_idea}" - this is the PROTAGONIST of your story
+2. Technical approaches (e.g., RL, neural networks) are IMPLEMENTATION MEANS, not the main characters
+3. Title and abstract MUST always highlight the User Idea's core concepts
+4. Even when injecting new techniques, describe them from the perspective of "how these techniques implement the User Idea"
+
+⚠️ 【HOW TO USE Fused Idea Guidance】
+If the request contains 【Conceptual Innovation from Idea Fusion】, this is THE MOST IMPORTANT guidance:
+- **Title & Abstract**: Must reflect the fused conceptual innovation, not just list techniques
+- **Problem Framing**: Adopt the NEW problem perspective from the fused idea
+- **Gap Pattern**: Explain why existing methods lack this conceptual unity
+- **Innovation Claims**: Frame as "transforming/reframing X from Y to Z", NOT "combining A with B"
+- **Method**: Show how techniques CO-EVOLVE to realize the fused concept, not just CO-EXIST
+
+⚠️ 【HOW TO USE Pattern Information】
+If the feedback mentions lack of technical depth or innovation, refer back to:
+- **【Solution Approaches】from Pattern**: Use these to add concrete technical steps to method_skeleton (always frame as "means to realize [Core Concept]")
+- **【Story Packaging Strategy】from Pattern**: Use the "Reframe/Transform" narrative pattern to strengthen problem_framing, gap_pattern, and innovation_claims
+
+【Refinement Principles】
+1. **Maintain User Idea Core**: No matter how you modify, ensure title, abstract, and claims all center on the user's core Idea.
+2. **Preserve Excellence**: Keep dimensions that scored high or weren't criticized (e.g., problem definition, experiment plan) as-is.
+3. **Deep Integration**: Organically embed newly injected techniques into method_skeleton's core logic as "means to implement User Idea".
+4. **Restructure, Don't Stack**: Don't simply append new techniques to existing methods; **transform existing steps** to make new techniques organic components of the methodology.
+5. **Concrete Description**: Avoid abstract descriptions; specifically explain how techniques implement, combine, and solve problems.
+
+【Core Requirement】: Integrate multiple newly injected techniques into **a coherent methodological framework** that serves the user's core Idea.
+
+【Output Requirements】
+Please output the refined complete Story JSON (must strictly follow the format below, do not omit any fields):
+
+Output Format (pure JSON, no other text):
+{{
+  "title": "...",
+  "abstract": "...",
+  "problem_framing": "...",
+  "gap_pattern": "...",
+  "solution": "...",
+  "method_skeleton": "Step 1; Step 2; Step 3 (must be a string, separated by semicolons)",
+  "innovation_claims": ["Claim 1", "Claim 2", "Claim 3"],
+  "experiments_plan": "..."
+}}
+
+Notes:
+- title MUST highlight User Idea's core concepts (e.g., "Self-Evolution of Agents via Reflection and Memory")
+- abstract: Start with the User Idea vision, then describe how you realize it with technical solutions
+- problem_framing: Use "Reframe [Core Concept] from X to Y" pattern to package the problem (100-150 words)
+- gap_pattern: Show why current methods fail for the Core Concepts (100-150 words)
+- solution: Describe the overall methodology with narrative packaging from 【Story Packaging Strategy】, emphasizing how solution approaches serve the Core Concepts (150-200 words, more descriptive)
+- method_skeleton: Technical architecture with 3-5 concrete implementation steps from 【Solution Approaches】, separated by semicolons (focused on technical structure)
+- innovation_claims must be a string array with 3 contribution points, **each using "Transform/Reframe" pattern**: "We transform [Core Concept] by [technical solution], achieving [benefit]"
+  * Example: "Transform agent self-evolution from a passive learning process to an active reflection-driven paradigm by integrating memory mechanisms with iterative self-assessment, enabling autonomous improvement without human intervention"
+  * Bad example: "Propose a novel state-space model for RL" (focuses on technique, not Core Concept)
+- All fields must be filled, no empty values allowed
+
+⚠️ LANGUAGE REQUIREMENT: Output ENTIRELY IN ENGLISH. No Chinese characters allowed.
+"""
+
     def _build_refinement_prompt(self, previous_story: Dict,
                                review_feedback: Dict,
                                new_tricks: List[str],
                                pattern_info: Dict,
                                fused_idea: Optional[Dict] = None,
                                reflection_guidance: Optional[Dict] = None) -> str:
-        """构建增量修正 Prompt (Editor Mode) - 强调深度方法论融合 + 概念级创新融合 + Reflection指导"""
+        """构建增量修正 Prompt (Editor Mode) - 强调深度方法论融合 + 概念级创新融合 + Reflection指导
+
+        只包含本轮变化的内容（当前 Story、评审反馈、融合/反思指导），固定规则见 _build_refinement_system_prompt
+        """
 
         # 提取评审意见摘要
         critique_summary = ""
@@ -230,21 +385,7 @@ class StoryGenerator:
             reflection_guidance_text += "⚠️ IMPORTANT: These guidance points are based on analyzing the fusion between your current Story and the new Pattern.\n"
             reflection_guidance_text += "Follow these strategies to ensure the fusion creates genuine conceptual innovation, not just technical stacking.\n"
 
-        # 提取用户Idea核心概念
-        user_idea_reminder = f"\n【User's Original Idea - THE PROTAGONIST】\n\"{self.user_idea}\"\n\nCore Concepts to Preserve: [Identify 2-4 key concepts from the idea above]\n"
-
         prompt = f"""
-You are a senior paper author at a top AI conference, skilled in deeply integrating new techniques into existing methods to form innovative technical combinations.
-
-{user_idea_reminder}
-
-⚠️ 【CRITICAL: User Idea Protection Rules During Refinement】
-When refining, ALWAYS remember:
-1. The user's core idea is "{self.user_idea}" - this is the PROTAGONIST of your story
-2. Technical approaches (e.g., RL, neural networks) are IMPLEMENTATION MEANS, not the main characters
-3. Title and abstract MUST always highlight the User Idea's core concepts
-4. Even when injecting new techniques, describe them from the perspective of "how these techniques implement the User Idea"
-
 【Current Story Version】
 Title: {previous_story.get('title')}
 Abstract: {previous_story.get('abstract')}
@@ -265,56 +406,7 @@ Claims: {json.dumps(previous_story.get('innovation_claims', []), ensure_ascii=Fa
 {specific_guidance}
 {pattern_reference}
 
-⚠️ 【HOW TO USE Fused Idea Guidance】
-If you received 【Conceptual Innovation from Idea Fusion】 above, this is THE MOST IMPORTANT guidance:
-- **Title & Abstract**: Must reflect the fused conceptual innovation, not just list techniques
-- **Problem Framing**: Adopt the NEW problem perspective from the fused idea
-- **Gap Pattern**: Explain why existing methods lack this conceptual unity
-- **Innovation Claims**: Frame as "transforming/reframing X from Y to Z", NOT "combining A with B"
-- **Method**: Show how techniques CO-EVOLVE to realize the fused concept, not just CO-EXIST
-
-⚠️ 【HOW TO USE Pattern Information】
-If the feedback mentions lack of technical depth or innovation, refer back to:
-- **【Solution Approaches】from Pattern**: Use these to add concrete technical steps to method_skeleton (always frame as "means to realize [Core Concept]")
-- **【Story Packaging Strategy】from Pattern**: Use the "Reframe/Transform" narrative pattern to strengthen problem_framing, gap_pattern, and innovation_claims
-
-【Refinement Principles】
-1. **Maintain User Idea Core**: No matter how you modify, ensure title, abstract, and claims all center on the user's core Idea.
-2. **Preserve Excellence**: Keep dimensions that scored high or weren't criticized (e.g., problem definition, experiment plan) as-is.
-3. **Deep Integration**: Organically embed newly injected techniques into method_skeleton's core logic as "means to implement User Idea".
-4. **Restructure, Don't Stack**: Don't simply append new techniques to existing methods; **transform existing steps** to make new techniques organic components of the methodology.
-5. **Concrete Description**: Avoid abstract descriptions; specifically explain how techniques implement, combine, and solve problems.
-
-【Core Requirement】: Integrate multiple newly injected techniques into **a coherent methodological framework** that serves the user's core Idea.
-
-【Output Requirements】
-Please output the refined complete Story JSON (must strictly follow the format below, do not omit any fields):
-
-Output Format (pure JSON, no other text):
-{{
-  "title": "...",
-  "abstract": "...",
-  "problem_framing": "...",
-  "gap_pattern": "...",
-  "solution": "...",
-  "method_skeleton": "Step 1; Step 2; Step 3 (must be a string, separated by semicolons)",
-  "innovation_claims": ["Claim 1", "Claim 2", "Claim 3"],
-  "experiments_plan": "..."
-}}
-
-Notes:
-- title MUST highlight User Idea's core concepts (e.g., "Self-Evolution of Agents via Reflection and Memory")
-- abstract: Start with the User Idea vision, then describe how you realize it with technical solutions
-- problem_framing: Use "Reframe [Core Concept] from X to Y" pattern to package the problem (100-150 words)
-- gap_pattern: Show why current methods fail for the Core Concepts (100-150 words)
-- solution: Describe the overall methodology with narrative packaging from 【Story Packaging Strategy】, emphasizing how solution approaches serve the Core Concepts (150-200 words, more descriptive)
-- method_skeleton: Technical architecture with 3-5 concrete implementation steps from 【Solution Approaches】, separated by semicolons (focused on technical structure)
-- innovation_claims must be a string array with 3 contribution points, **each using "Transform/Reframe" pattern**: "We transform [Core Concept] by [technical solution], achieving [benefit]"
-  * Example: "Transform agent self-evolution from a passive learning process to an active reflection-driven paradigm by integrating memory mechanisms with iterative self-assessment, enabling autonomous improvement without human intervention"
-  * Bad example: "Propose a novel state-space model for RL" (focuses on technique, not Core Concept)
-- All fields must be filled, no empty values allowed
-
-⚠️ LANGUAGE REQUIREMENT: Output ENTIRELY IN ENGLISH. No Chinese characters allowed.
+Please output the refined complete Story JSON following the 【Output Requirements】 (pure JSON, no other text).
 """
         return prompt
 
@@ -322,7 +414,10 @@ Notes:
     def _build_generation_prompt(self, pattern_info: Dict,
                                   constraints: Optional[List[str]],
                                   injected_tricks: Optional[List[str]]) -> str:
-        """构建生成 Prompt (适配新的 Pattern 结构)"""
+        """构建生成 Prompt (适配新的 Pattern 结构)
+
+        只包含 Idea 与 Pattern 相关内容，固定指令见 GENERATION_SYSTEM_PROMPT
+        """
 
         # 提取 Pattern 信息
         pattern_name = pattern_info.get('name', '')
@@ -331,10 +426,13 @@ Notes:
         # 新结构: 从 summary 字段提取
         summary = pattern_info.get('summary', {})
         if isinstance(summary, dict):
-            representative_ideas = summary.get('representative_ideas', [])[:3]  # 取前3个
-            common_problems = summary.get('common_problems', [])[:3]
-            solution_approaches = summary.get('solution_approaches', [])[:3]
-            story_guides = summary.get('story', [])[:2]
+            def _items(key: str, n: int) -> List[str]:
+                return [str(item)[:SUMMARY_ITEM_MAX_CHARS] for item in summary.get(key, [])[:n]]
+
+            representative_ideas = _items('representative_ideas', 3)  # 取前3个
+            common_problems = _items('common_problems', 3)
+            solution_approaches = _items('solution_approaches', 3)
+            story_guides = _items('story', 2)
         else:
             # Fallback: 旧结构兼容
             representative_ideas = []
@@ -342,8 +440,8 @@ Notes:
             solution_approaches = []
             story_guides = []
 
-        # 兼容旧结构 (如果存在 skeleton_examples)
-        skeleton_examples = pattern_info.get('skeleton_examples', [])[:2]
+        # 兼容旧结构 (如果存在 skeleton_examples)；已有注入技巧时只保留 1 个示例
+        skeleton_examples = pattern_info.get('skeleton_examples', [])[:1 if injected_tricks else 2]
 
         # 构建代表性想法文本
         ideas_text = ""
@@ -427,20 +525,9 @@ Notes:
                 emphasis_text += f"   {i}. {trick}\n"
 
         prompt = f"""
-You are a senior paper author at a top AI conference. Generate a structured paper story based on the user's idea and writing template.
+【User Idea】"{self.user_idea}"
 
-【STEP 1: Extract Core Concepts from User Idea】
-User Idea: "{self.user_idea}"
-
-Before writing anything, identify the CORE ENTITIES in the user idea (e.g., "Agent", "Reflection", "Memory", "Self-Evolution").
-These are the TRUE subjects of your paper. Write them down:
-Core Concepts: [Extract 2-4 key concepts from the user idea above]
-
-⚠️ 【CRITICAL: User Idea Protection Rules】
-1. **The Core Concepts above are the PROTAGONISTS** of your story. They must appear in the title, abstract, problem_framing, gap_pattern, and all innovation claims.
-2. **Pattern's techniques are TOOLS, NOT the hero**: The writing template below provides technical approaches (e.g., RL, neural models) as "means to implement the user's core concepts". They should NEVER become the main focus.
-3. **Title & Abstract must highlight Core Concepts**: Technical terms can only appear as modifiers (e.g., "Self-Evolution of Agents via X" ✅, "X-based Framework" ❌).
-4. **Method serves Core Concepts**: method_skeleton should describe "how to use Pattern's techniques to realize the user's core concepts", not list technique names.
+First identify the CORE ENTITIES in the user idea (e.g., "Agent", "Reflection", "Memory", "Self-Evolution") — 2-4 Core Concepts that are the TRUE subjects of your paper.
 
 【Writing Template】{pattern_name} (contains {pattern_size} papers)
 {ideas_text}
@@ -452,70 +539,7 @@ Core Concepts: [Extract 2-4 key concepts from the user idea above]
 {injection_text}
 {emphasis_text}
 
-【Task Requirements】
-Generate structured content (JSON format) that tells a compelling story about the User Idea.
-
-【STEP 2: How to Use the Writing Template】
-
-**Part 1: Extract Technical Solutions from 【Solution Approaches】**
-- These are concrete technical methods you will use to implement the User Idea
-- Extract and adapt them into your method_skeleton
-- BUT: Always describe them as "means to realize [Core Concept]", not as standalone techniques
-
-**Part 2: Learn Packaging Strategy from 【Story Packaging Strategy】**
-- These show the "Reframe X as Y" narrative pattern
-- Use this pattern to write:
-  * problem_framing: "Reframe [Core Concept] from [old view] to [new transformative view]"
-  * gap_pattern: "Current methods for [Core Concept] fail because..."
-  * innovation_claims: "Our approach transforms [Core Concept] by..."
-- The pattern demonstrates how to position technical solutions as TRANSFORMATIVE INSIGHTS, not just methods
-
-**Part 3: Reference 【参考论文的包装策略】 for storytelling examples**
-- See how real papers package their problem, gap, and method narratives
-- Learn the FLOW: problem → gap → solution → transformation
-
-Key Guidelines:
-- **Core Principle**: User Idea is the protagonist; Pattern's techniques are tools
-- **Method Construction**: Use 【Solution Approaches】 to build concrete steps, framed as "implementing [Core Concept]"
-- **Story Packaging**: Use 【Story Packaging Strategy】 to write problem_framing, gap_pattern, claims with "Reframe/Transform" narratives
-- **Integration**: If 【必须融合的技巧】 is provided, integrate them as additional means to realize Core Concepts
-- **Avoid Technique Focus**: Never let technical terms overshadow the Core Concepts
-
-Output Fields (ALL IN ENGLISH):
-1. title: Paper title (MUST highlight User Idea's core concepts; technique names only as modifiers)
-2. abstract: Abstract (150-200 words, User Idea as main thread, describe both the VISION and the SOLUTION)
-3. problem_framing: How to introduce the problem (100-150 words, use "Reframe/Transform" pattern, center on core concepts)
-4. gap_pattern: How to critique existing methods (100-150 words, show why current approaches fail for core concepts, use "Reframe" pattern)
-5. solution: Overall methodology description (150-200 words, narrative style using 【Story Packaging Strategy】, emphasize how solutions serve Core Concepts, more descriptive than method_skeleton)
-6. method_skeleton: Technical architecture (3-5 implementation steps separated by semicolons, extract from 【Solution Approaches】, focused on concrete technical structure)
-7. innovation_claims: 3 core contribution points (list format, use "Transform/Reframe" pattern from 【Story Packaging Strategy】, each claim MUST mention core concepts AND show transformation)
-8. experiments_plan: Experiment design (50-80 words)
-
-Output Format (pure JSON, no other text):
-{{
-  "title": "...",
-  "abstract": "...",
-  "problem_framing": "...",
-  "gap_pattern": "...",
-  "solution": "...",
-  "method_skeleton": "Step 1; Step 2; Step 3...",
-  "innovation_claims": ["Contribution 1", "Contribution 2", "Contribution 3"],
-  "experiments_plan": "..."
-}}
-
-Critical Notes on Each Field:
-- title: MUST highlight Core Concepts (e.g., "Self-Evolution of Agents via Reflection and Memory")
-- abstract: Start with User Idea vision, then describe the technical realization
-- problem_framing: Use "Reframe [Core Concept] from X to Y" pattern learned from 【Story Packaging Strategy】
-- gap_pattern: Critique existing methods for Core Concepts, use "Reframe" pattern
-- solution: **NEW FIELD** - Describe the overall solution methodology with narrative packaging (150-200 words, more descriptive, emphasizes HOW solution approaches serve Core Concepts)
-- method_skeleton: Technical architecture with concrete implementation steps from 【Solution Approaches】 (focused on structure, 3-5 steps)
-- innovation_claims: **CRITICAL** - Must use "Transform/Reframe" pattern:
-  * Good example: "Transform agent self-evolution from passive RL training to an active reflection-memory paradigm by integrating episodic memory with self-assessment mechanisms, enabling autonomous improvement"
-  * Bad example: "Propose a novel state-space model architecture" (technique-focused, not idea-focused)
-  * Each claim MUST: mention Core Concept + describe transformation + specify technical means + show benefit
-
-⚠️ LANGUAGE REQUIREMENT: Output ENTIRELY IN ENGLISH. No Chinese characters allowed.
+Generate the Story JSON that tells a compelling story about the User Idea (pure JSON, no other text).
 """
         return prompt
 
@@ -539,8 +563,8 @@ Critical Notes on Each Field:
         def extract_str(key):
             # 更加健壮的正则：允许换行、特殊字符、嵌套引号
             # 匹配模式: "key": "value..." 其中 value 可以跨多行，直到遇到未转义的引号后跟逗号或}
-            pattern = r'"' + re.escape(key) + r'"\s*:\s*"((?:[^"\\]|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*)"'
-            match = re.search(pattern, text, re.DOTALL)
+            strict_re, loose_re, _ = _field_patterns(key)
+            match = strict_re.search(text)
             if match:
                 val = match.group(1)
                 # 处理转义字符
@@ -552,8 +576,7 @@ Critical Notes on Each Field:
                 return val
 
             # 尝试另一种提取方式: 寻找 key 之后的首个引号，然后提取到最后一个合理的引号
-            alt_pattern = r'"' + re.escape(key) + r'"\s*:\s*"([^"]*(?:\\.[^"]*)*)"'
-            match = re.search(alt_pattern, text, re.DOTALL)
+            match = loose_re.search(text)
             if match:
                 val = match.group(1)
                 val = val.replace('\\"', '"')
@@ -564,13 +587,12 @@ Critical Notes on Each Field:
 
         # 辅助函数：提取列表
         def extract_list(key):
-            pattern = r'"' + re.escape(key) + r'"\s*:\s*\[(.*?)\]'
-            match = re.search(pattern, text, re.DOTALL)
+            match = _field_patterns(key)[2].search(text)
             if match:
                 content = match.group(1)
                 items = []
                 # 更加精确地提取列表项
-                for m in re.finditer(r'"((?:[^"\\]|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*)"', content):
+                for m in _JSON_STRING_ITEM_RE.finditer(content):
                     item = m.group(1)
                     item = item.replace('\\"', '"')
                     item = item.replace('\\n', '\n')
@@ -683,6 +705,10 @@ Output ONLY a JSON format (no other text):
 
     def _print_story(self, story: Dict):
         """打印生成的 Story (英文版 + 中文调试版) - 显示完整内容"""
+        if not PipelineConfig.VERBOSE:
+            print(f"\n   📄 生成的 Story: {story.get('title', '')}")
+            return
+
         print("\n   📄 生成的 Story (英文版):")
         print(f"   ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
         print(f"   Title: {story.get('title', '')}")
@@ -704,21 +730,42 @@ Output ONLY a JSON format (no other text):
             print(f"     {i}. {claim}")
         print(f"   ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
 
-        # 生成中文调试版
-        print("\n   📄 中文调试版:")
-        print(f"   ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        # 生成中文调试版（后台模式下与后续 Critic 评审重叠，完成后整块打印）
+        if PipelineConfig.ASYNC_STORY_TRANSLATION:
+            if self._translation_executor is None:
+                self._translation_executor = ThreadPoolExecutor(max_workers=1)
+            self._pending_translations = [f for f in self._pending_translations if not f.done()]
+            self._pending_translations.append(
+                self._translation_executor.submit(self._print_chinese_story, dict(story))
+            )
+        else:
+            self._print_chinese_story(story)
+
+    def wait_for_translations(self):
+        """等待后台翻译全部打印完成（Pipeline 结束前调用，避免输出被截断）"""
+        if self._pending_translations:
+            wait(self._pending_translations)
+            self._pending_translations = []
+
+    def _print_chinese_story(self, story: Dict):
+        """翻译并打印中文调试版（整块输出，避免与其他线程的输出交错）"""
         cn_story = self._translate_story_to_chinese(story)
-        print(f"   标题: {cn_story.get('title', '')}")
-        print(f"   摘要: {cn_story.get('abstract', '')}")
+        lines = [
+            "\n   📄 中文调试版:",
+            f"   ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━",
+            f"   标题: {cn_story.get('title', '')}",
+            f"   摘要: {cn_story.get('abstract', '')}",
+        ]
         if cn_story.get('problem_framing'):
-            print(f"   问题包装: {cn_story.get('problem_framing', '')}")
+            lines.append(f"   问题包装: {cn_story.get('problem_framing', '')}")
         if cn_story.get('gap_pattern'):
-            print(f"   Gap包装: {cn_story.get('gap_pattern', '')}")
+            lines.append(f"   Gap包装: {cn_story.get('gap_pattern', '')}")
         if cn_story.get('solution'):
-            print(f"   解决方案: {cn_story.get('solution', '')}")
-        print(f"   方法架构: {cn_story.get('method_skeleton', '')}")
-        print(f"   贡献:")
+            lines.append(f"   解决方案: {cn_story.get('solution', '')}")
+        lines.append(f"   方法架构: {cn_story.get('method_skeleton', '')}")
+        lines.append(f"   贡献:")
         for i, claim in enumerate(cn_story.get('innovation_claims', []), 1):
-            print(f"     {i}. {claim}")
-        print(f"   ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+            lines.append(f"     {i}. {claim}")
+        lines.append(f"   ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        print("\n".join(lines))
 
@@ -1,17 +1,87 @@
+import hashlib
 import json
+import mmap
+import random
 import re
+import threading
 import time
 import warnings
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, List, Optional
 
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+try:
+    import orjson  # 可选：更快的 JSON 解析
+except ImportError:
+    orjson = None
+
+try:
+    import json5  # 可选：容错 JSON 解析（尾逗号、单引号等），未安装时仅使用正则修复
+except ImportError:
+    json5 = None
+
 # 抑制 urllib3 的 OpenSSL 警告
 warnings.filterwarnings("ignore", category=UserWarning, module='urllib3')
 
-from .config import LLM_API_KEY, LLM_API_URL, LLM_MODEL
+from .config import (
+    PipelineConfig, LLM_API_KEY, LLM_API_URL, LLM_MODEL,
+    LLM_CACHE_MAX_TEMPERATURE, LLM_CACHE_PERSIST, LLM_CACHE_FILE
+)
+
+
+class LLMCache:
+    """LLM 响应缓存：按 (model, temperature, max_tokens, prompt) 精确匹配
+
+    只缓存成功的响应；可选追加写入 jsonl 文件，下次运行时加载复用
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None):
+        self.cache_file = cache_file
+        self._exact: Dict[str, str] = {}
+        self._lock = threading.Lock()  # Critic 等模块会并发调用 call_llm
+
+        if cache_file is not None and cache_file.exists():
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self._exact[record['key']] = record['response']
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        continue
+
+    @staticmethod
+    def make_key(prompt: str, temperature: float, max_tokens: int, model: str = LLM_MODEL) -> str:
+        return hashlib.sha256(f"{model}|{temperature}|{max_tokens}|{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        return self._exact.get(key)
+
+    def put(self, key: str, response: str):
+        with self._lock:
+            self._exact[key] = response
+            if self.cache_file is not None:
+                self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.cache_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'key': key, 'response': response}, ensure_ascii=False) + '\n')
+
+
+_LLM_CACHE = LLMCache(LLM_CACHE_FILE if LLM_CACHE_PERSIST else None)
+
+# 预编译正则（JSON 清理与修复，每次解析 LLM 响应都会用到）
+# 字符串字面量采用展开循环写法 "[^"\\]*(?:\\.[^"\\]*)*"：与 (?:[^"\\]|\\.)* 匹配结果相同，
+# 但普通字符整段匹配，不再逐字符进入分支，长响应上快数倍
+_QUOTED_STRING_RE = re.compile(r'"([^"\\]*(?:\\.[^"\\]*)*)"', re.DOTALL)
+_CONTROL_CHARS = ('\n', '\r', '\t')
+
+# JSON 解析：优先 orjson（接受 str/bytes；解析失败抛出的 orjson.JSONDecodeError 是 json.JSONDecodeError 的子类）
+json_loads = orjson.loads if orjson is not None else json.loads
+_TRAILING_COMMA_RE = re.compile(r',(\s*[}\]])')
+_MISSING_FIELD_COMMA_RE = re.compile(r'("\s*)\n?\s*"')
+_MISSING_STRUCT_COMMA_RE = re.compile(r'(}|])\s*\n?\s*"')
 
 def _create_session_with_retries():
     """创建带有重试机制的 requests Session"""
@@ -25,14 +95,100 @@ def _create_session_with_retries():
         allowed_methods=["POST", "GET"]
     )
 
-    # 为 HTTP 和 HTTPS 适配器应用重试策略
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    # 为 HTTP 和 HTTPS 适配器应用重试策略；连接池容量覆盖并发调用的线程数
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=16, pool_maxsize=32)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
 
     return session
 
-def call_llm(prompt: str, temperature: float = 0.7, max_tokens: int = 2000, timeout: int = 120) -> str:
+_HTTP_SESSION: Optional[requests.Session] = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+def get_http_session() -> requests.Session:
+    """获取进程内共享的 Session（带重试；复用 TCP/TLS 连接，避免每次调用重新握手）"""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        with _HTTP_SESSION_LOCK:
+            if _HTTP_SESSION is None:
+                _HTTP_SESSION = _create_session_with_retries()
+    return _HTTP_SESSION
+
+_NEXT_REQUEST_TIME = 0.0
+_RATE_LIMIT_LOCK = threading.Lock()
+
+def _wait_for_rate_limit():
+    """按 LLM_MIN_REQUEST_INTERVAL 为请求分配发送时刻，只等待距该时刻的剩余时间（后端空闲时不等待）"""
+    global _NEXT_REQUEST_TIME
+    interval = PipelineConfig.LLM_MIN_REQUEST_INTERVAL
+    if interval <= 0:
+        return
+    with _RATE_LIMIT_LOCK:
+        now = time.monotonic()
+        slot = max(now, _NEXT_REQUEST_TIME)
+        _NEXT_REQUEST_TIME = slot + interval
+    if slot > now:
+        time.sleep(slot - now)
+
+def _retry_delay(attempt: int) -> float:
+    """第 attempt 次失败后的等待时间：指数退避 + 随机抖动，避免并发请求同时重试"""
+    return min(2 ** attempt + random.random(), PipelineConfig.LLM_RETRY_MAX_DELAY)
+
+class _JsonObjectScanner:
+    """增量扫描流式文本，判断第一个顶层 JSON 对象是否已闭合（跳过字符串内的括号）"""
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, text: str) -> bool:
+        for ch in text:
+            if not self.started:
+                if ch == '{':
+                    self.started = True
+                    self.depth = 1
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == '{':
+                self.depth += 1
+            elif ch == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
+
+def _read_stream_content(response, stop_at_json_end: bool) -> str:
+    """读取 OpenAI 兼容的 SSE 流式响应并拼接 content"""
+    parts = []
+    scanner = _JsonObjectScanner() if stop_at_json_end else None
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            choices = json.loads(payload).get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content") or ""
+            parts.append(delta)
+            if scanner is not None and scanner.feed(delta):
+                break  # JSON 已完整，不再等待剩余 token
+    finally:
+        response.close()
+    return "".join(parts)
+
+def call_llm(prompt: str, temperature: float = 0.7, max_tokens: int = 2000, timeout: int = 120,
+             max_retries: Optional[int] = None, system_prompt: str = "", stream: bool = False) -> str:
     """
     调用 LLM API（支持重试和延长超时）
 
@@ -41,64 +197,94 @@ def call_llm(prompt: str, temperature: float = 0.7, max_tokens: int = 2000, time
         temperature: 温度参数
         max_tokens: 最大 token 数
         timeout: 请求超时时间（秒），默认 120s
+        max_retries: 最大尝试次数，默认 PipelineConfig.LLM_MAX_RETRIES
+        system_prompt: 可选的 system 消息；多次调用间保持不变的指令放在这里，
+                       可命中服务端的前缀缓存（prefix cache），减少重复预填充
+        stream: 流式读取响应；第一个 JSON 对象闭合后立即结束读取（仅用于要求输出纯 JSON 的调用）
     """
     if not LLM_API_KEY:
         print("⚠️  警告: LLM_API_KEY 未配置，使用模拟输出")
         return f"[模拟LLM输出] Prompt: {prompt[:100]}..."
 
+    # 低温度调用命中缓存时直接返回，跳过 HTTP 请求
+    cache_key = None
+    if temperature <= LLM_CACHE_MAX_TEMPERATURE:
+        cache_prompt = f"[system]{system_prompt}[user]{prompt}" if system_prompt else prompt
+        cache_key = LLMCache.make_key(cache_prompt, temperature, max_tokens)
+        cached = _LLM_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
     headers = {
         "Authorization": f"Bearer {LLM_API_KEY}",
         "Content-Type": "application/json"
     }
 
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+
     data = {
         "model": LLM_MODEL,
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": messages,
         "temperature": temperature,
         "max_tokens": max_tokens
     }
+    if stream:
+        data["stream"] = True
 
-    max_retries = 3
-    retry_delay = 2
+    if max_retries is None:
+        max_retries = PipelineConfig.LLM_MAX_RETRIES
 
     for attempt in range(max_retries):
         try:
-            session = _create_session_with_retries()
+            session = get_http_session()
 
             if attempt > 0:
                 print(f"   ⏳ 重试 LLM 调用 (尝试 {attempt + 1}/{max_retries})...")
-                time.sleep(retry_delay)
 
+            _wait_for_rate_limit()
             response = session.post(
                 LLM_API_URL,
                 headers=headers,
                 json=data,
-                timeout=timeout
+                timeout=timeout,
+                stream=stream
             )
             response.raise_for_status()
-            session.close()
-            return response.json()["choices"][0]["message"]["content"]
+            if stream:
+                content = _read_stream_content(response, stop_at_json_end=True)
+            else:
+                content = response.json()["choices"][0]["message"]["content"]
+            if cache_key is not None and content:
+                _LLM_CACHE.put(cache_key, content)
+            return content
 
         except requests.exceptions.Timeout as e:
             print(f"   ⚠️  超时异常 (尝试 {attempt + 1}/{max_retries}): 读取超时")
-            if attempt < max_retries - 1:
-                print(f"   ⏳ {retry_delay} 秒后重试...")
-            else:
-                print(f"❌ LLM 调用失败（超时）: {e}")
-                return ""
+            error_kind, last_error = "超时", e
 
         except requests.exceptions.ConnectionError as e:
             print(f"   ⚠️  连接异常 (尝试 {attempt + 1}/{max_retries}): {str(e)[:60]}")
-            if attempt < max_retries - 1:
-                print(f"   ⏳ {retry_delay} 秒后重试...")
-            else:
-                print(f"❌ LLM 调用失败（连接错误）: {e}")
-                return ""
+            error_kind, last_error = "连接错误", e
+
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            # 响应体不是预期的 JSON（网关错误页、截断响应等）
+            print(f"   ⚠️  响应解析异常 (尝试 {attempt + 1}/{max_retries}): {str(e)[:60]}")
+            error_kind, last_error = "响应解析错误", e
 
         except Exception as e:
             print(f"❌ LLM 调用失败: {e}")
             return ""
 
+        if attempt < max_retries - 1:
+            delay = _retry_delay(attempt)
+            print(f"   ⏳ {delay:.1f} 秒后重试...")
+            time.sleep(delay)
+        else:
+            print(f"❌ LLM 调用失败（{error_kind}）: {last_error}")
+
     return ""
 
 def clean_json_text(text: str) -> str:
@@ -125,13 +311,20 @@ def parse_json_from_llm(response: str) -> Optional[Dict[str, Any]]:
         if start >= 0 and end > start:
             json_str = clean_response[start:end]
 
+            # 2.0 格式正确的响应直接解析，跳过后续正则扫描
+            try:
+                return json_loads(json_str)
+            except json.JSONDecodeError:
+                pass
+
             # 2.1 预处理：处理非法控制字符
             def replace_control_chars(match):
                 s = match.group(0)
                 return s.replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
 
-            # 匹配双引号包裹的内容
-            json_str = re.sub(r'"((?:[^"\\]|\\.)*)"', replace_control_chars, json_str, flags=re.DOTALL)
+            # 匹配双引号包裹的内容（不含控制字符时整段扫描可以跳过）
+            if any(c in json_str for c in _CONTROL_CHARS):
+                json_str = _QUOTED_STRING_RE.sub(replace_control_chars, json_str)
 
             # 2.2 尝试直接解析
             try:
@@ -139,14 +332,21 @@ def parse_json_from_llm(response: str) -> Optional[Dict[str, Any]]:
             except json.JSONDecodeError:
                 pass
 
-            # 2.3 尝试修复常见的 JSON 错误
+            # 2.3 容错解析器（单次扫描，原生支持尾逗号等非标准写法）
+            if json5 is not None:
+                try:
+                    return json5.loads(json_str)
+                except Exception:
+                    pass
+
+            # 2.4 兜底：正则修复常见的 JSON 错误
             repaired = json_str
             # 移除尾部逗号
-            repaired = re.sub(r',(\s*[}\]])', r'\1', repaired)
+            repaired = _TRAILING_COMMA_RE.sub(r'\1', repaired)
             # 修复字段间缺失逗号 (如 "val" "key")
-            repaired = re.sub(r'("\s*)\n?\s*"', r'\1,\n"', repaired)
+            repaired = _MISSING_FIELD_COMMA_RE.sub(r'\1,\n"', repaired)
             # 修复结构间缺失逗号 (如 } "key" 或 ] "key")
-            repaired = re.sub(r'(}|])\s*\n?\s*"', r'\1,\n"', repaired)
+            repaired = _MISSING_STRUCT_COMMA_RE.sub(r'\1,\n"', repaired)
 
             try:
                 return json.loads(repaired)
@@ -159,6 +359,57 @@ def parse_json_from_llm(response: str) -> Optional[Dict[str, Any]]:
         print(f"   ⚠️  JSON 解析工具内部错误: {e}")
         return None
 
+def load_json(filepath: Path, use_mmap: bool = False) -> Any:
+    """读取 JSON 数据文件（安装了 orjson 时整块读入后用 orjson 解析，大文件加载快数倍）
+
+    use_mmap=True 时以内存映射方式交给 orjson 解析，省去整文件读入的中间拷贝
+    """
+    if orjson is None:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    with open(filepath, 'rb') as f:
+        if use_mmap and Path(filepath).stat().st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as buf:
+                return orjson.loads(buf)
+        return orjson.loads(f.read())
+
+def dumps_json(data: Any, indent: bool = True) -> bytes:
+    """序列化为 UTF-8 JSON 字节（保留非 ASCII 字符；indent=True 时缩进 2）
+
+    安装了 orjson 时优先使用；数据中有 orjson 不支持的类型时回退到标准库 json。
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(data, option=option)
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
+def save_json(data: Any, filepath: Path):
+    """写出 JSON 文件（UTF-8、缩进 2）"""
+    with open(filepath, 'wb') as f:
+        f.write(dumps_json(data))
+
+def save_json_list(records: List, filepath: Path):
+    """逐条流式写出 JSON 列表（格式与 save_json 一致）
+
+    每次只序列化一条记录，避免先在内存中拼出整个文件
+    """
+    with open(filepath, 'wb') as f:
+        if not records:
+            f.write(b'[]')
+            return
+        f.write(b'[\n')
+        for i, record in enumerate(records):
+            if i:
+                f.write(b',\n')
+            # 记录整体缩进一级，与 indent=2 的列表元素对齐
+            f.write(b'  ' + dumps_json(record).replace(b'\n', b'\n  '))
+        f.write(b'\n]')
+
 def compute_jaccard_similarity(text1: str, text2: str) -> float:
     """计算文本相似度（Jaccard）"""
     tokens1 = set(text1.lower().split())
@@ -172,3 +423,12 @@ def compute_jaccard_similarity(text1: str, text2: str) -> float:
 
     return len(intersection) / len(union)
 
+
+@lru_cache(maxsize=None)
+def idea_key(text: str) -> bytes:
+    """Idea 去重键：描述文本的 64 位 BLAKE2b 摘要
+
+    仅用于去重，不需要密码学强度，比 MD5 + hexdigest 更快；
+    构建 Idea 节点和关联 Paper 时会对同一文本重复取键，故做缓存
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
@@ -1,7 +1,9 @@
-from typing import List, Dict
+from collections import Counter, defaultdict
+from typing import List, Dict, Tuple
 
 from .config import PipelineConfig
-from .utils import compute_jaccard_similarity
+
+SIMILAR_PAPER_THRESHOLD = 0.3  # 相似度不超过该值的论文不计入相似论文列表
 
 
 class RAGVerifier:
@@ -10,6 +12,20 @@ class RAGVerifier:
     def __init__(self, papers: List[Dict]):
         self.papers = papers
 
+        # 预先分词并建立倒排索引（词 -> 论文下标）：verify 时只需遍历查询词的倒排列表，
+        # 即可精确得到与每篇论文的交集大小，没有共同词的论文（相似度为 0）不会被访问
+        self._paper_entries: List[Tuple[Dict, str, int]] = []  # (paper, method_story, 词数)
+        self._token_index: Dict[str, List[int]] = defaultdict(list)
+        for paper in papers[:PipelineConfig.VERIFY_PAPER_LIMIT]:
+            paper_method = paper.get('skeleton', {}).get('method_story', '')
+            if not paper_method:
+                continue
+            tokens = frozenset(paper_method.lower().split())
+            idx = len(self._paper_entries)
+            self._paper_entries.append((paper, paper_method, len(tokens)))
+            for token in tokens:
+                self._token_index[token].append(idx)
+
     def verify(self, story: Dict) -> Dict:
         """查重验证
 
@@ -44,14 +60,22 @@ class RAGVerifier:
         print(f"🔍 检索与当前 Story 相似的论文...")
         print(f"   查询: {method_skeleton[:80]}...")
 
-        for paper in self.papers[:50]:  # 仅检查前 50 篇（演示用）
-            paper_method = paper.get('skeleton', {}).get('method_story', '')
-            if not paper_method:
-                continue
+        query_tokens = frozenset(method_skeleton.lower().split())
+        n_query = len(query_tokens)
+        overlap = Counter()
+        for token in query_tokens:
+            overlap.update(self._token_index.get(token, ()))
 
-            similarity = compute_jaccard_similarity(method_skeleton, paper_method)
+        for idx in sorted(overlap):  # 按论文原顺序，保证相似度并列时排序结果不变
+            paper, paper_method, n_tokens = self._paper_entries[idx]
+            # 长度比预检：Jaccard <= 较短词集 / 较长词集，词数相差过大的论文不可能超过阈值
+            if n_tokens <= SIMILAR_PAPER_THRESHOLD * n_query or n_query <= SIMILAR_PAPER_THRESHOLD * n_tokens:
+                continue
+            # Jaccard 相似度（与 compute_jaccard_similarity 一致）
+            intersection = overlap[idx]
+            similarity = intersection / (n_query + n_tokens - intersection)
 
-            if similarity > 0.3:  # 过滤低相似度
+            if similarity > SIMILAR_PAPER_THRESHOLD:  # 过滤低相似度
                 similar_papers.append({
                     'paper_id': paper.get('paper_id', ''),
                     'title': paper.get('title', ''),
@@ -12,16 +12,25 @@ V3版本更新:
   - Paper通过review_stats获取质量分数，支持兼容旧结构
 """
 
-import json
+import hashlib
+import heapq
+import io
 import os
 import pickle
+import sys
+import threading
 import time
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
-import requests
+from sklearn.feature_extraction.text import CountVectorizer
+
+# 导入pipeline工具函数
+sys.path.insert(0, str(Path(__file__).parent))
+from pipeline.utils import get_http_session, load_json
 
 # ===================== 配置 =====================
 SCRIPT_DIR = Path(__file__).parent
@@ -35,6 +44,12 @@ NODES_DOMAIN = OUTPUT_DIR / "nodes_domain.json"
 NODES_PAPER = OUTPUT_DIR / "nodes_paper.json"
 EDGES_FILE = OUTPUT_DIR / "edges.json"
 GRAPH_FILE = OUTPUT_DIR / "knowledge_graph_v2.gpickle"
+RECALL_GRAPH_CACHE = OUTPUT_DIR / "recall_graph_cache.pkl"  # 召回子图缓存（由 GRAPH_FILE 自动生成）
+
+# 召回只用到这三种边；其余边（主要是上十万条 similar_to_paper）不进入召回子图
+RECALL_RELATIONS = ('belongs_to', 'works_well_in', 'uses_pattern')
+# 召回子图构建方式的版本号：修改 _build_recall_graph 时递增，使旧缓存自动失效
+RECALL_GRAPH_BUILDER_VERSION = 1
 
 
 # ===================== 召回参数配置 =====================
@@ -58,6 +73,10 @@ class RecallConfig:
     # 最终召回的Top-K
     FINAL_TOP_K = 10
 
+    # 三路融合方式: "weighted" 按权重累加原始得分；"rrf" 倒数排名融合（各路得分尺度不同，按名次融合不受尺度影响）
+    FUSION_METHOD = "weighted"
+    RRF_K = 60  # RRF 平滑常数: 路径贡献 = 路径权重 / (RRF_K + 名次)
+
     # 相似度计算方式
     USE_EMBEDDING = True  # 使用embedding计算相似度（推荐），False则使用Jaccard
 
@@ -66,6 +85,123 @@ class RecallConfig:
     COARSE_RECALL_SIZE = 100     # 粗召回数量（Jaccard快速筛选）
     FINE_RECALL_SIZE = 20        # 精排数量（Embedding精确排序）
 
+    # Embedding 缓存（LRU）：user_idea 在每次比较中都会重复出现，只需请求一次
+    EMBEDDING_CACHE_SIZE = 4096
+
+    # 路径3（相似Paper）与路径1→路径2 并行：路径3精排所需的 Embedding 在后台线程预取，
+    # 与路径1/2 的 Embedding 请求重叠；各路输出顺序不变
+    PARALLEL_PATHS = True
+
+    # 预热启动：首次运行从完整图谱抽取召回子图并缓存到 RECALL_GRAPH_CACHE，
+    # 之后图谱文件未变化时直接加载子图（GRAPH_FILE 的 mtime / 大小变化时自动重建）
+    USE_GRAPH_CACHE = True
+
+
+def _build_recall_graph(G):
+    """抽取只含 RECALL_RELATIONS 边的召回子图（保留全部节点）
+
+    各节点出边、入边的遍历顺序决定召回得分的累加顺序及并列名次，
+    因此按同时满足原图出边、入边相对顺序的拓扑序插入边，使子图的邻接顺序与原图一致
+    """
+    edges = [(u, v) for u, v, data in G.edges(data=True) if data.get('relation') in RECALL_RELATIONS]
+    kept = set(edges)
+
+    # 约束: 同一节点相邻的两条出边（或入边）保持原图中的先后顺序
+    followers = defaultdict(list)
+    pending = dict.fromkeys(edges, 0)
+    for node in G:
+        for chain in ([(node, v) for v in G.succ[node]], [(u, node) for u in G.pred[node]]):
+            chain = [edge for edge in chain if edge in kept]
+            for before, after in zip(chain, chain[1:]):
+                followers[before].append(after)
+                pending[after] += 1
+
+    sub = G.__class__()
+    sub.add_nodes_from(G)
+    queue = deque(edge for edge in edges if pending[edge] == 0)
+    while queue:
+        edge = queue.popleft()
+        u, v = edge
+        sub.add_edge(u, v, **G.succ[u][v])
+        for after in followers[edge]:
+            pending[after] -= 1
+            if pending[after] == 0:
+                queue.append(after)
+    return sub
+
+
+def load_recall_graph():
+    """加载召回用图谱
+
+    返回: (G, 原图节点数, 原图边数)
+    """
+    if not RecallConfig.USE_GRAPH_CACHE:
+        with open(GRAPH_FILE, 'rb') as f:
+            G = pickle.load(f)
+        return G, G.number_of_nodes(), G.number_of_edges()
+
+    stat = GRAPH_FILE.stat()
+    source = (RECALL_GRAPH_BUILDER_VERSION, stat.st_mtime_ns, stat.st_size, RECALL_RELATIONS)
+
+    if RECALL_GRAPH_CACHE.exists():
+        try:
+            with open(RECALL_GRAPH_CACHE, 'rb') as f:
+                cache = pickle.load(f)
+            if cache.get('source') == source:
+                return cache['graph'], cache['num_nodes'], cache['num_edges']
+        except Exception as e:
+            print(f"  ⚠️  召回子图缓存读取失败，重新构建: {e}")
+
+    with open(GRAPH_FILE, 'rb') as f:
+        G = pickle.load(f)
+    cache = {
+        'source': source,
+        'graph': _build_recall_graph(G),
+        'num_nodes': G.number_of_nodes(),
+        'num_edges': G.number_of_edges(),
+    }
+
+    try:
+        tmp_file = RECALL_GRAPH_CACHE.with_suffix('.tmp')
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, RECALL_GRAPH_CACHE)
+        print(f"  ✓ 召回子图已缓存: {RECALL_GRAPH_CACHE}")
+    except OSError as e:
+        print(f"  ⚠️  召回子图缓存写入失败: {e}")
+
+    return cache['graph'], cache['num_nodes'], cache['num_edges']
+
+
+def path_contributions(path1_scores: Dict[str, float], path2_scores: Dict[str, float],
+                       path3_scores: Dict[str, float],
+                       weights: Optional[Tuple[float, float, float]] = None) -> List[Dict[str, float]]:
+    """计算三路召回各自对最终得分的贡献 [{pattern_id: 贡献}, ...]
+
+    FUSION_METHOD="weighted": 贡献 = 路径得分 × 路径权重
+    FUSION_METHOD="rrf":      贡献 = 路径权重 / (RRF_K + 该路中的名次)，名次从 1 开始
+
+    Args:
+        weights: 三路权重，默认使用 RecallConfig.PATH1/2/3_WEIGHT
+    """
+    if weights is None:
+        weights = (RecallConfig.PATH1_WEIGHT, RecallConfig.PATH2_WEIGHT, RecallConfig.PATH3_WEIGHT)
+    weighted_paths = zip((path1_scores, path2_scores, path3_scores), weights)
+
+    if RecallConfig.FUSION_METHOD == "rrf":
+        return [
+            {pattern_id: weight / (RecallConfig.RRF_K + rank)
+             for rank, pattern_id in enumerate(sorted(scores, key=scores.get, reverse=True), 1)}
+            for scores, weight in weighted_paths
+        ]
+    return [{pattern_id: score * weight for pattern_id, score in scores.items()}
+            for scores, weight in weighted_paths]
+
+
+def _split_tokens(text: str) -> set:
+    """Jaccard 用的词集合：小写后按空白切分"""
+    return set(text.lower().split())
+
 
 # ===================== 召回系统 =====================
 class RecallSystem:
@@ -75,14 +211,13 @@ class RecallSystem:
         print("🚀 初始化召回系统...")
 
         # 加载数据
-        self.ideas = self._load_json(NODES_IDEA)
-        self.patterns = self._load_json(NODES_PATTERN)
-        self.domains = self._load_json(NODES_DOMAIN)
-        self.papers = self._load_json(NODES_PAPER)
+        self.ideas = load_json(NODES_IDEA)
+        self.patterns = load_json(NODES_PATTERN)
+        self.domains = load_json(NODES_DOMAIN)
+        self.papers = load_json(NODES_PAPER)
 
-        # 加载图谱
-        with open(GRAPH_FILE, 'rb') as f:
-            self.G = pickle.load(f)
+        # 加载图谱（召回子图，见 load_recall_graph）
+        self.G, num_nodes, num_edges = load_recall_graph()
 
         # 构建索引
         self.idea_id_to_idea = {i['idea_id']: i for i in self.ideas}
@@ -90,18 +225,28 @@ class RecallSystem:
         self.domain_id_to_domain = {d['domain_id']: d for d in self.domains}
         self.paper_id_to_paper = {p['paper_id']: p for p in self.papers}
 
+        # 粗排用的二值词袋矩阵（分词与 _compute_jaccard_similarity 一致：小写后按空白切分），
+        # Idea 描述与 Paper 标题共用一个词表，查询时一次稀疏矩阵乘法得到与所有文本的交集大小
+        self._token_vectorizer = CountVectorizer(analyzer=_split_tokens, binary=True, dtype=np.int32)
+        token_mat = self._token_vectorizer.fit_transform(
+            [idea['description'] for idea in self.ideas] + [paper.get('title', '') for paper in self.papers]
+        ).tocsr()
+        self._idea_token_mat = token_mat[:len(self.ideas)]
+        self._paper_token_mat = token_mat[len(self.ideas):]
+        self._idea_token_sizes = np.asarray(self._idea_token_mat.sum(axis=1)).ravel()
+        self._paper_token_sizes = np.asarray(self._paper_token_mat.sum(axis=1)).ravel()
+
+        # Embedding 缓存: sha256(输入文本) -> 向量
+        self._embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._embedding_cache_lock = threading.Lock()
+
         print(f"  ✓ 加载 {len(self.ideas)} 个Idea")
         print(f"  ✓ 加载 {len(self.patterns)} 个Pattern")
         print(f"  ✓ 加载 {len(self.domains)} 个Domain")
         print(f"  ✓ 加载 {len(self.papers)} 个Paper")
-        print(f"  ✓ 图谱节点: {self.G.number_of_nodes()}, 边: {self.G.number_of_edges()}")
+        print(f"  ✓ 图谱节点: {num_nodes}, 边: {num_edges}")
         print()
 
-    def _load_json(self, filepath: Path) -> List[Dict]:
-        """加载JSON文件"""
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-
     def _compute_text_similarity(self, text1: str, text2: str) -> float:
         """计算两个文本的相似度
 
@@ -130,6 +275,25 @@ class RecallSystem:
 
         return len(intersection) / len(union)
 
+    def _batch_jaccard_similarity(self, text: str, token_mat, token_sizes: np.ndarray) -> np.ndarray:
+        """text 与词袋矩阵每一行的 Jaccard 相似度（结果与逐条调用 _compute_jaccard_similarity 相同）"""
+        query_size = len(_split_tokens(text))
+        if query_size == 0:
+            return np.zeros(token_mat.shape[0])
+
+        query = self._token_vectorizer.transform([text])
+        intersection = (token_mat @ query.T).toarray().ravel().astype(np.float64)
+        return intersection / (token_sizes + query_size - intersection)
+
+    def _idea_similarities(self, user_idea: str) -> np.ndarray:
+        """user_idea 与全部 Idea 的相似度（结果与逐条调用 _compute_text_similarity 相同）
+
+        Jaccard 模式下用户 Idea 只分词一次，通过词袋矩阵批量求交集
+        """
+        if RecallConfig.USE_EMBEDDING:
+            return np.array([self._compute_text_similarity(user_idea, idea['description']) for idea in self.ideas])
+        return self._batch_jaccard_similarity(user_idea, self._idea_token_mat, self._idea_token_sizes)
+
     def _compute_embedding_similarity(self, text1: str, text2: str) -> float:
         """基于embedding的余弦相似度（更准确）"""
         # 获取两个文本的embedding
@@ -141,13 +305,32 @@ class RecallSystem:
             return self._compute_jaccard_similarity(text1, text2)
 
         # 计算余弦相似度
-        emb1 = np.array(emb1)
-        emb2 = np.array(emb2)
+        emb1 = np.asarray(emb1)
+        emb2 = np.asarray(emb2)
 
         cosine_sim = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
         return float(cosine_sim)
 
-    def _get_embedding(self, text: str, max_retries: int = 3) -> List[float]:
+    def _get_embedding(self, text: str, max_retries: int = 3) -> np.ndarray:
+        """获取文本embedding（命中缓存时不调用API）"""
+        text = text[:2000]  # 限制长度避免超限
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+        with self._embedding_cache_lock:
+            cached = self._embedding_cache.get(key)
+            if cached is not None:
+                self._embedding_cache.move_to_end(key)
+                return cached
+
+        embedding = self._request_embedding(text, max_retries)
+        if embedding is not None:
+            with self._embedding_cache_lock:
+                self._embedding_cache[key] = embedding
+                if len(self._embedding_cache) > RecallConfig.EMBEDDING_CACHE_SIZE:
+                    self._embedding_cache.popitem(last=False)
+        return embedding
+
+    def _request_embedding(self, text: str, max_retries: int = 3) -> np.ndarray:
         """调用SiliconFlow API获取文本embedding"""
         api_key = os.environ.get('SILICONFLOW_API_KEY', '')
 
@@ -165,15 +348,15 @@ class RecallSystem:
 
         payload = {
             "model": "Qwen/Qwen3-Embedding-8B",
-            "input": text[:2000]  # 限制长度避免超限
+            "input": text
         }
 
         for attempt in range(max_retries):
             try:
-                response = requests.post(url, headers=headers, json=payload, timeout=10)
+                response = get_http_session().post(url, headers=headers, json=payload, timeout=10)
                 response.raise_for_status()
                 result = response.json()
-                return result['data'][0]['embedding']
+                return np.asarray(result['data'][0]['embedding'], dtype=np.float64)
             except Exception as e:
                 if attempt < max_retries - 1:
                     time.sleep(0.5)
@@ -220,9 +403,8 @@ class RecallSystem:
         if not scores:
             return 0.5
 
-        # 计算平均分并归一化
-        import numpy as np
-        avg_score = np.mean(scores)
+        # 计算平均分并归一化（列表很短，直接 sum/len，省去构造 ndarray）
+        avg_score = sum(scores) / len(scores)
         # 假设评分范围是 1-10，归一化到 [0, 1]
         normalized_score = (avg_score - 1) / 9
 
@@ -230,7 +412,8 @@ class RecallSystem:
 
     # ===================== 路径1: Idea → Idea → Pattern =====================
 
-    def _recall_path1_similar_ideas(self, user_idea: str) -> Tuple[Dict[str, float], List[Tuple[str, float]]]:
+    def _recall_path1_similar_ideas(self, user_idea: str,
+                                    verbose: bool = True) -> Tuple[Dict[str, float], List[Tuple[str, float]]]:
         """路径1: 通过相似Idea召回Pattern (V3版本 + 两阶段优化)
 
         流程:
@@ -248,14 +431,10 @@ class RecallSystem:
         # Step 1: 粗排 - 使用Jaccard快速筛选
         if RecallConfig.TWO_STAGE_RECALL and RecallConfig.USE_EMBEDDING:
             print(f"  [粗排] 使用Jaccard快速筛选Top-{RecallConfig.COARSE_RECALL_SIZE}...")
-            coarse_similarities = []
-            for idea in self.ideas:
-                sim = self._compute_jaccard_similarity(user_idea, idea['description'])
-                if sim > 0:
-                    coarse_similarities.append((idea['idea_id'], sim))
+            sims = self._batch_jaccard_similarity(user_idea, self._idea_token_mat, self._idea_token_sizes)
+            coarse_similarities = [(self.ideas[i]['idea_id'], float(sims[i])) for i in np.flatnonzero(sims > 0)]
 
-            coarse_similarities.sort(key=lambda x: x[1], reverse=True)
-            candidates = coarse_similarities[:RecallConfig.COARSE_RECALL_SIZE]
+            candidates = heapq.nlargest(RecallConfig.COARSE_RECALL_SIZE, coarse_similarities, key=lambda x: x[1])
 
             print(f"  [精排] 使用Embedding重排Top-{RecallConfig.FINE_RECALL_SIZE}...")
             # Step 2: 精排 - 对候选使用Embedding重新计算
@@ -266,20 +445,15 @@ class RecallSystem:
                 if sim > 0:
                     fine_similarities.append((idea_id, sim))
 
-            fine_similarities.sort(key=lambda x: x[1], reverse=True)
-            top_ideas = fine_similarities[:RecallConfig.PATH1_TOP_K_IDEAS]
+            top_ideas = heapq.nlargest(RecallConfig.PATH1_TOP_K_IDEAS, fine_similarities, key=lambda x: x[1])
 
             print(f"  ✓ 粗排{len(coarse_similarities)}个 → 精排{len(candidates)}个 → 最终{len(top_ideas)}个")
         else:
             # 单阶段召回（原逻辑）
-            similarities = []
-            for idea in self.ideas:
-                sim = self._compute_text_similarity(user_idea, idea['description'])
-                if sim > 0:
-                    similarities.append((idea['idea_id'], sim))
+            sims = self._idea_similarities(user_idea)
+            similarities = [(self.ideas[i]['idea_id'], float(sims[i])) for i in np.flatnonzero(sims > 0)]
 
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            top_ideas = similarities[:RecallConfig.PATH1_TOP_K_IDEAS]
+            top_ideas = heapq.nlargest(RecallConfig.PATH1_TOP_K_IDEAS, similarities, key=lambda x: x[1])
             print(f"  找到 {len(similarities)} 个相似Idea，选择Top-{RecallConfig.PATH1_TOP_K_IDEAS}")
 
         # Step 3: 直接从Idea节点获取pattern_ids并计算得分
@@ -290,24 +464,25 @@ class RecallSystem:
             pattern_ids = idea.get('pattern_ids', [])
 
             # 打印Idea的前300个字符用于调试
-            idea_desc = idea.get('description', '')[:300]
-            print(f"  - [{idea_id}] {idea_desc}... (相似度={similarity:.3f}, {len(pattern_ids)}个Pattern)")
+            if verbose:
+                idea_desc = idea.get('description', '')[:300]
+                print(f"  - [{idea_id}] {idea_desc}... (相似度={similarity:.3f}, {len(pattern_ids)}个Pattern)")
 
             # V3版本: 直接使用Idea节点中的pattern_ids
             for pattern_id in pattern_ids:
                 # 得分 = 相似度 (Paper质量暂时默认0.5，已集成在相似度中)
                 pattern_scores[pattern_id] += similarity
 
-        # 排序并只保留Top-K个Pattern
-        sorted_patterns = sorted(pattern_scores.items(), key=lambda x: x[1], reverse=True)
-        top_patterns = dict(sorted_patterns[:RecallConfig.PATH1_FINAL_TOP_K])
+        # 只保留Top-K个Pattern
+        top_patterns = dict(heapq.nlargest(RecallConfig.PATH1_FINAL_TOP_K, pattern_scores.items(), key=lambda x: x[1]))
 
         print(f"  ✓ 召回 {len(pattern_scores)} 个Pattern，保留Top-{RecallConfig.PATH1_FINAL_TOP_K}")
         return top_patterns, top_ideas
 
     # ===================== 路径2: Idea → Domain → Pattern =====================
 
-    def _recall_path2_domain_patterns(self, user_idea: str, top_ideas: List[Tuple[str, float]] = None) -> Dict[str, float]:
+    def _recall_path2_domain_patterns(self, user_idea: str, top_ideas: List[Tuple[str, float]] = None,
+                                      verbose: bool = True) -> Dict[str, float]:
         """路径2: 通过领域相关性召回Pattern
 
         流程:
@@ -332,8 +507,7 @@ class RecallSystem:
             top_idea = self.idea_id_to_idea.get(top_idea_id)
 
             if top_idea and self.G.has_node(top_idea['idea_id']):
-                for successor in self.G.successors(top_idea['idea_id']):
-                    edge_data = self.G[top_idea['idea_id']][successor]
+                for successor, edge_data in self.G.succ[top_idea['idea_id']].items():
                     if edge_data.get('relation') == 'belongs_to':
                         domain_id = successor
                         weight = edge_data.get('weight', 0.5)
@@ -342,27 +516,20 @@ class RecallSystem:
         # Fallback: 如果没有找到Domain，重新计算最相似的Idea
         if not domain_scores:
             print("  未找到直接关联的Domain，重新计算最相似Idea...")
-            similarities = []
-            for idea in self.ideas:
-                sim = self._compute_text_similarity(user_idea, idea['description'])
-                if sim > 0:
-                    similarities.append((idea, sim))
-
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            top_idea = similarities[0][0] if similarities else None
+            sims = self._idea_similarities(user_idea)
+            best = int(np.argmax(sims)) if len(sims) else -1  # 并列时取第一个，与 max() 一致
+            top_idea = self.ideas[best] if best >= 0 and sims[best] > 0 else None
 
             if top_idea:
                 # 通过图谱找到Idea的Domain
-                for successor in self.G.successors(top_idea['idea_id']):
-                    edge_data = self.G[top_idea['idea_id']][successor]
+                for successor, edge_data in self.G.succ[top_idea['idea_id']].items():
                     if edge_data.get('relation') == 'belongs_to':
                         domain_id = successor
                         weight = edge_data.get('weight', 0.5)
                         domain_scores.append((domain_id, weight))
 
         # Step 2: 排序并选择Top-K Domain
-        domain_scores.sort(key=lambda x: x[1], reverse=True)
-        top_domains = domain_scores[:RecallConfig.PATH2_TOP_K_DOMAINS]
+        top_domains = heapq.nlargest(RecallConfig.PATH2_TOP_K_DOMAINS, domain_scores, key=lambda x: x[1])
 
         print(f"  找到 {len(domain_scores)} 个相关Domain，选择Top-{RecallConfig.PATH2_TOP_K_DOMAINS}")
 
@@ -375,20 +542,21 @@ class RecallSystem:
                 continue
 
             # 打印Domain详细信息
-            domain_name = domain.get('name', 'N/A')
-            paper_count = domain.get('paper_count', 0)
-            sub_domains = domain.get('sub_domains', [])
-            sub_domain_str = ', '.join(sub_domains[:5])  # 只显示前5个sub_domain
-            if len(sub_domains) > 5:
-                sub_domain_str += f"... (共{len(sub_domains)}个)"
-
-            print(f"  - {domain_id} (名称={domain_name}, 相关度={domain_weight:.3f}, 论文数={paper_count})")
-            if sub_domain_str:
-                print(f"    子领域: {sub_domain_str}")
+            if verbose:
+                domain_name = domain.get('name', 'N/A')
+                paper_count = domain.get('paper_count', 0)
+                sub_domains = domain.get('sub_domains', [])
+                sub_domain_str = ', '.join(sub_domains[:5])  # 只显示前5个sub_domain
+                if len(sub_domains) > 5:
+                    sub_domain_str += f"... (共{len(sub_domains)}个)"
+
+                print(f"  - {domain_id} (名称={domain_name}, 相关度={domain_weight:.3f}, 论文数={paper_count})")
+                if sub_domain_str:
+                    print(f"    子领域: {sub_domain_str}")
 
             # 找到在该Domain中表现好的Pattern
-            for predecessor in self.G.predecessors(domain_id):
-                edge_data = self.G[predecessor][domain_id]
+            # 直接遍历邻接字典，边属性随邻居一并取出（Domain 的入边上万条，避免逐条 G[u][v] 二次查找）
+            for predecessor, edge_data in self.G.pred[domain_id].items():
                 if edge_data.get('relation') == 'works_well_in':
                     pattern_id = predecessor
                     effectiveness = edge_data.get('effectiveness', 0.0)
@@ -398,16 +566,33 @@ class RecallSystem:
                     score = domain_weight * max(effectiveness, 0.1) * confidence
                     pattern_scores[pattern_id] += score
 
-        # 排序并只保留Top-K个Pattern（避免召回过多）
-        sorted_patterns = sorted(pattern_scores.items(), key=lambda x: x[1], reverse=True)
-        top_patterns = dict(sorted_patterns[:RecallConfig.PATH2_FINAL_TOP_K])
+        # 只保留Top-K个Pattern（避免召回过多）
+        top_patterns = dict(heapq.nlargest(RecallConfig.PATH2_FINAL_TOP_K, pattern_scores.items(), key=lambda x: x[1]))
 
         print(f"  ✓ 召回 {len(pattern_scores)} 个Pattern，保留Top-{RecallConfig.PATH2_FINAL_TOP_K}")
         return top_patterns
 
     # ===================== 路径3: Idea → Paper → Pattern =====================
 
-    def _recall_path3_similar_papers(self, user_idea: str) -> Dict[str, float]:
+    def _coarse_paper_candidates(self, user_idea: str) -> Tuple[List[Tuple[str, float]], List[Tuple[str, float]]]:
+        """路径3粗排: 返回 (所有超过阈值的Paper, Jaccard Top-N 候选)"""
+        # 无标题的 Paper 词数为 0，相似度恒为 0，会被阈值过滤
+        sims = self._batch_jaccard_similarity(user_idea, self._paper_token_mat, self._paper_token_sizes)
+        coarse_similarities = [
+            (self.papers[i]['paper_id'], float(sims[i]))
+            for i in np.flatnonzero(sims > 0.05)  # 降低阈值以保留更多候选
+        ]
+        candidates = heapq.nlargest(RecallConfig.COARSE_RECALL_SIZE, coarse_similarities, key=lambda x: x[1])
+        return coarse_similarities, candidates
+
+    def _prefetch_path3_embeddings(self, candidates: List[Tuple[str, float]]):
+        """预取路径3精排要用的候选Paper标题 Embedding（写入缓存，不输出）"""
+        for paper_id, _ in candidates:
+            self._get_embedding(self.paper_id_to_paper[paper_id].get('title', ''))
+
+    def _recall_path3_similar_papers(self, user_idea: str, verbose: bool = True,
+                                     coarse: Optional[Tuple[List[Tuple[str, float]], List[Tuple[str, float]]]] = None
+                                     ) -> Dict[str, float]:
         """路径3: 通过相似Paper召回Pattern (V3版本 + 两阶段优化)
 
         流程:
@@ -420,6 +605,9 @@ class RecallSystem:
           - 使用Paper的title进行相似度计算(与路径1的idea description互补)
           - V3版本Paper暂无review数据时，质量默认0.5
 
+        Args:
+            coarse: 已算好的粗排结果 _coarse_paper_candidates(user_idea)，为 None 时在此计算
+
         返回: {pattern_id: score}
         """
         print("\n📄 [路径3] 相似Paper召回...")
@@ -427,19 +615,7 @@ class RecallSystem:
         # Step 1: 粗排 - 使用Jaccard快速筛选
         if RecallConfig.TWO_STAGE_RECALL and RecallConfig.USE_EMBEDDING:
             print(f"  [粗排] 使用Jaccard快速筛选Top-{RecallConfig.COARSE_RECALL_SIZE}...")
-            coarse_similarities = []
-
-            for paper in self.papers:
-                paper_title = paper.get('title', '')
-                if not paper_title:
-                    continue
-
-                sim = self._compute_jaccard_similarity(user_idea, paper_title)
-                if sim > 0.05:  # 降低阈值以保留更多候选
-                    coarse_similarities.append((paper['paper_id'], sim))
-
-            coarse_similarities.sort(key=lambda x: x[1], reverse=True)
-            candidates = coarse_similarities[:RecallConfig.COARSE_RECALL_SIZE]
+            coarse_similarities, candidates = coarse if coarse is not None else self._coarse_paper_candidates(user_idea)
 
             print(f"  [精排] 使用Embedding重排Top-{RecallConfig.PATH3_TOP_K_PAPERS}...")
             # Step 2: 精排 - 对候选使用Embedding重新计算
@@ -454,8 +630,7 @@ class RecallSystem:
                     combined_weight = sim * quality
                     fine_similarities.append((paper_id, sim, quality, combined_weight))
 
-            fine_similarities.sort(key=lambda x: x[3], reverse=True)
-            top_papers = fine_similarities[:RecallConfig.PATH3_TOP_K_PAPERS]
+            top_papers = heapq.nlargest(RecallConfig.PATH3_TOP_K_PAPERS, fine_similarities, key=lambda x: x[3])
 
             print(f"  ✓ 粗排{len(coarse_similarities)}个 → 精排{len(candidates)}个 → 最终{len(top_papers)}个")
         else:
@@ -473,8 +648,7 @@ class RecallSystem:
                     combined_weight = sim * quality
                     similarities.append((paper['paper_id'], sim, quality, combined_weight))
 
-            similarities.sort(key=lambda x: x[3], reverse=True)
-            top_papers = similarities[:RecallConfig.PATH3_TOP_K_PAPERS]
+            top_papers = heapq.nlargest(RecallConfig.PATH3_TOP_K_PAPERS, similarities, key=lambda x: x[3])
 
             print(f"  找到 {len(similarities)} 个相似Paper，选择Top-{RecallConfig.PATH3_TOP_K_PAPERS}")
 
@@ -482,24 +656,24 @@ class RecallSystem:
         pattern_scores = defaultdict(float)
 
         for paper_id, similarity, quality, combined_weight in top_papers:
-            paper = self.paper_id_to_paper.get(paper_id, {})
-            # 判断质量来源：优先检查review_stats，然后是reviews，否则是默认值
-            if paper.get('review_stats'):
-                quality_source = f"review({paper['review_stats'].get('review_count', 0)}条)"
-            elif paper.get('reviews'):
-                quality_source = "review"
-            else:
-                quality_source = "默认"
-            title = paper.get('title', 'N/A')
-            print(f"  - {paper_id} (相似度={similarity:.3f}, 质量={quality:.3f} [{quality_source}])")
-            print(f"    标题: {title}")
+            if verbose:
+                paper = self.paper_id_to_paper.get(paper_id, {})
+                # 判断质量来源：优先检查review_stats，然后是reviews，否则是默认值
+                if paper.get('review_stats'):
+                    quality_source = f"review({paper['review_stats'].get('review_count', 0)}条)"
+                elif paper.get('reviews'):
+                    quality_source = "review"
+                else:
+                    quality_source = "默认"
+                title = paper.get('title', 'N/A')
+                print(f"  - {paper_id} (相似度={similarity:.3f}, 质量={quality:.3f} [{quality_source}])")
+                print(f"    标题: {title}")
 
             # 从图谱中找到Paper使用的Pattern
             if not self.G.has_node(paper_id):
                 continue
 
-            for successor in self.G.successors(paper_id):
-                edge_data = self.G[paper_id][successor]
+            for successor, edge_data in self.G.succ[paper_id].items():
                 if edge_data.get('relation') == 'uses_pattern':
                     pattern_id = successor
                     pattern_quality = edge_data.get('quality', 0.5)
@@ -508,9 +682,8 @@ class RecallSystem:
                     score = combined_weight * pattern_quality
                     pattern_scores[pattern_id] += score
 
-        # 排序并只保留Top-K个Pattern
-        sorted_patterns = sorted(pattern_scores.items(), key=lambda x: x[1], reverse=True)
-        top_patterns = dict(sorted_patterns[:RecallConfig.PATH3_FINAL_TOP_K])
+        # 只保留Top-K个Pattern
+        top_patterns = dict(heapq.nlargest(RecallConfig.PATH3_FINAL_TOP_K, pattern_scores.items(), key=lambda x: x[1]))
 
         print(f"  ✓ 召回 {len(pattern_scores)} 个Pattern，保留Top-{RecallConfig.PATH3_FINAL_TOP_K}")
         return top_patterns
@@ -522,7 +695,7 @@ class RecallSystem:
 
         Args:
             user_idea: 用户输入的Idea描述
-            verbose: 是否打印详细信息
+            verbose: 是否打印详细信息（各路逐条明细及最终结果）
 
         Returns:
             [(pattern_id, pattern_info, score), ...] 按得分排序
@@ -532,77 +705,91 @@ class RecallSystem:
         print("=" * 80)
         print(f"\n【用户Idea】\n{user_idea}\n")
 
+        # 路径3粗排只算一次，预取与路径3精排共用
+        coarse = None
+        if RecallConfig.TWO_STAGE_RECALL and RecallConfig.USE_EMBEDDING:
+            coarse = self._coarse_paper_candidates(user_idea)
+
+        # 路径3不依赖路径1/2：其精排 Embedding 在后台预取（未配置 API Key 时没有可预取的内容）
+        prefetch = None
+        if coarse is not None and RecallConfig.PARALLEL_PATHS and os.environ.get('SILICONFLOW_API_KEY'):
+            # 用户 Idea 的 Embedding 先在主线程取好，避免预取线程与路径1在冷缓存时重复请求同一文本
+            self._get_embedding(user_idea)
+            executor = ThreadPoolExecutor(max_workers=1)
+            prefetch = executor.submit(self._prefetch_path3_embeddings, coarse[1])
+            executor.shutdown(wait=False)
+
         # 路径1: 相似Idea召回
-        path1_scores, top_ideas = self._recall_path1_similar_ideas(user_idea)
+        path1_scores, top_ideas = self._recall_path1_similar_ideas(user_idea, verbose=verbose)
 
         # 路径2: 领域相关性召回（使用路径1的Top Ideas）
-        path2_scores = self._recall_path2_domain_patterns(user_idea, top_ideas=top_ideas)
+        path2_scores = self._recall_path2_domain_patterns(user_idea, top_ideas=top_ideas, verbose=verbose)
 
-        # 路径3: 相似Paper召回
-        path3_scores = self._recall_path3_similar_papers(user_idea)
+        # 路径3: 相似Paper召回（等待预取完成，精排时直接命中 Embedding 缓存）
+        if prefetch is not None:
+            prefetch.result()
+        path3_scores = self._recall_path3_similar_papers(user_idea, verbose=verbose, coarse=coarse)
 
         # 融合三路得分
         print("\n🔗 融合三路召回结果...")
-        all_patterns = set(path1_scores.keys()) | set(path2_scores.keys()) | set(path3_scores.keys())
-
+        # 单遍累加：各路贡献直接累加到最终得分，无需先求三路 Pattern 的并集再逐个查表
+        contributions = path_contributions(path1_scores, path2_scores, path3_scores)
         final_scores = {}
-        for pattern_id in all_patterns:
-            score1 = path1_scores.get(pattern_id, 0.0) * RecallConfig.PATH1_WEIGHT
-            score2 = path2_scores.get(pattern_id, 0.0) * RecallConfig.PATH2_WEIGHT
-            score3 = path3_scores.get(pattern_id, 0.0) * RecallConfig.PATH3_WEIGHT
-
-            final_scores[pattern_id] = score1 + score2 + score3
+        for path_contribution in contributions:
+            for pattern_id, score in path_contribution.items():
+                final_scores[pattern_id] = final_scores.get(pattern_id, 0.0) + score
 
-        # 排序并返回Top-K
-        ranked = sorted(final_scores.items(), key=lambda x: x[1], reverse=True)
-        top_k = ranked[:RecallConfig.FINAL_TOP_K]
+        # 取Top-K（heapq.nlargest 与 sorted(..., reverse=True)[:K] 结果及并列顺序一致，无需全量排序）
+        top_k = heapq.nlargest(RecallConfig.FINAL_TOP_K, final_scores.items(), key=lambda x: x[1])
 
         # 构建返回结果
-        results = []
-        for pattern_id, score in top_k:
-            pattern_info = self.pattern_id_to_pattern.get(pattern_id, {})
-            results.append((pattern_id, pattern_info, score))
+        results = [(pattern_id, self.pattern_id_to_pattern.get(pattern_id, {}), score) for pattern_id, score in top_k]
 
         # 打印结果
         if verbose:
-            self._print_results(results, path1_scores, path2_scores, path3_scores)
+            self._print_results(results, contributions)
 
         return results
 
-    def _print_results(self, results: List[Tuple[str, Dict, float]],
-                      path1_scores: Dict, path2_scores: Dict, path3_scores: Dict):
-        """打印召回结果"""
-        print("\n" + "=" * 80)
-        print(f"📊 召回结果 Top-{RecallConfig.FINAL_TOP_K}")
-        print("=" * 80)
+    def _print_results(self, results: List[Tuple[str, Dict, float]], contributions: List[Dict[str, float]]):
+        """打印召回结果（先写入缓冲区，最后一次性输出）"""
+        out = io.StringIO()
+        print("\n" + "=" * 80, file=out)
+        print(f"📊 召回结果 Top-{RecallConfig.FINAL_TOP_K}", file=out)
+        print("=" * 80, file=out)
+
+        # 各路得分矩阵 (3, K) 及占比一次性批量计算，最终得分为 0 时占比记为 0
+        path_scores = np.array([[path.get(pattern_id, 0.0) for pattern_id, _, _ in results]
+                                for path in contributions]).reshape(len(contributions), len(results))
+        totals = np.array([final_score for _, _, final_score in results])
+        pcts = path_scores / np.where(totals == 0, 1.0, totals) * 100
 
         for rank, (pattern_id, pattern_info, final_score) in enumerate(results, 1):
-            print(f"\n【Rank {rank}】 {pattern_id}")
-            print(f"  名称: {pattern_info.get('name', 'N/A')}")
-            print(f"  最终得分: {final_score:.4f}")
+            print(f"\n【Rank {rank}】 {pattern_id}", file=out)
+            print(f"  名称: {pattern_info.get('name', 'N/A')}", file=out)
+            print(f"  最终得分: {final_score:.4f}", file=out)
 
             # 显示各路得分
-            score1 = path1_scores.get(pattern_id, 0.0) * RecallConfig.PATH1_WEIGHT
-            score2 = path2_scores.get(pattern_id, 0.0) * RecallConfig.PATH2_WEIGHT
-            score3 = path3_scores.get(pattern_id, 0.0) * RecallConfig.PATH3_WEIGHT
+            (score1, score2, score3), (pct1, pct2, pct3) = path_scores[:, rank - 1], pcts[:, rank - 1]
 
-            print(f"  - 路径1 (相似Idea):   {score1:.4f} (占比 {score1/final_score*100:.1f}%)")
-            print(f"  - 路径2 (领域相关):   {score2:.4f} (占比 {score2/final_score*100:.1f}%)")
-            print(f"  - 路径3 (相似Paper):  {score3:.4f} (占比 {score3/final_score*100:.1f}%)")
+            print(f"  - 路径1 (相似Idea):   {score1:.4f} (占比 {pct1:.1f}%)", file=out)
+            print(f"  - 路径2 (领域相关):   {score2:.4f} (占比 {pct2:.1f}%)", file=out)
+            print(f"  - 路径3 (相似Paper):  {score3:.4f} (占比 {pct3:.1f}%)", file=out)
 
-            print(f"  聚类大小: {pattern_info.get('size', 0)} 篇论文")
+            print(f"  聚类大小: {pattern_info.get('size', 0)} 篇论文", file=out)
 
             # V3版本: 优先显示LLM增强的总结，否则显示原始示例
             if pattern_info.get('llm_enhanced_summary'):
                 llm_summary = pattern_info['llm_enhanced_summary'].get('representative_ideas', '')
-                print(f"  归纳总结: {llm_summary[:120]}...")
+                print(f"  归纳总结: {llm_summary[:120]}...", file=out)
             else:
                 summary = pattern_info.get('summary', {})
                 ideas = summary.get('representative_ideas', [])
                 if ideas:
-                    print(f"  示例Idea: {ideas[0][:120] if ideas else 'N/A'}...")
+                    print(f"  示例Idea: {ideas[0][:120] if ideas else 'N/A'}...", file=out)
 
-        print("\n" + "=" * 80)
+        print("\n" + "=" * 80, file=out)
+        sys.stdout.write(out.getvalue())
 
 
 # ===================== Demo 测试用例 =====================
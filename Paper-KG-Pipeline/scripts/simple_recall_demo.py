@@ -13,16 +13,21 @@ V3版本更新:
   - Paper通过review_stats获取质量分数，支持兼容旧结构
 """
 
-import json
+import heapq
 import os
-import pickle
 import sys
 import time
 from collections import defaultdict
+from functools import lru_cache
 from pathlib import Path
 
 import numpy as np
-import requests
+
+# 导入pipeline工具函数
+sys.path.insert(0, str(Path(__file__).parent))
+from pipeline.utils import get_http_session, load_json
+# 三路融合方式（FUSION_METHOD / RRF_K）与召回子图缓存（USE_GRAPH_CACHE）见 RecallConfig
+from recall_system import load_recall_graph, path_contributions
 
 # ===================== 路径配置 =====================
 SCRIPT_DIR = Path(__file__).parent
@@ -59,6 +64,20 @@ COARSE_RECALL_SIZE = 100     # 粗召回数量（Jaccard快速筛选）
 
 
 # ===================== 工具函数 =====================
+def _data_signature():
+    """数据文件签名: ((路径, mtime_ns), ...)，任一文件变化时签名随之变化"""
+    return tuple((str(path), path.stat().st_mtime_ns)
+                 for path in (NODES_IDEA, NODES_PATTERN, NODES_DOMAIN, NODES_PAPER, GRAPH_FILE))
+
+@lru_cache(maxsize=1)
+def _load_all(signature):
+    """加载全部节点数据与召回图谱（按数据文件签名缓存，同一进程内多次调用 main 时只加载一次）
+
+    返回: (ideas, patterns, domains, papers, (G, 原图节点数, 原图边数))，调用方不应修改返回的数据
+    """
+    return (load_json(NODES_IDEA), load_json(NODES_PATTERN), load_json(NODES_DOMAIN),
+            load_json(NODES_PAPER), load_recall_graph())
+
 def compute_similarity(text1, text2):
     """计算两个文本的相似度"""
     if USE_EMBEDDING:
@@ -66,9 +85,20 @@ def compute_similarity(text1, text2):
     else:
         return compute_jaccard_similarity(text1, text2)
 
+def compute_similarities(text, texts):
+    """计算 text 与一组文本的相似度（text 一侧只向量化/分词一次）"""
+    if USE_EMBEDDING:
+        return compute_embedding_similarities(text, texts)
+    else:
+        tokens = frozenset(text.lower().split())
+        return [jaccard_similarity_with_tokens(tokens, t) for t in texts]
+
 def compute_jaccard_similarity(text1, text2):
     """词袋Jaccard相似度（快速但不准确）"""
-    tokens1 = set(text1.lower().split())
+    return jaccard_similarity_with_tokens(frozenset(text1.lower().split()), text2)
+
+def jaccard_similarity_with_tokens(tokens1, text2):
+    """与 compute_jaccard_similarity 相同，但一侧已预先分词（循环中对固定的 user_idea 只分词一次）"""
     tokens2 = set(text2.lower().split())
 
     if not tokens1 or not tokens2:
@@ -92,6 +122,32 @@ def compute_embedding_similarity(text1, text2):
     cosine_sim = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
     return float(cosine_sim)
 
+def compute_embedding_similarities(text, texts):
+    """批量余弦相似度：text 的 embedding 与范数只算一次，其余文本堆叠成矩阵做一次矩阵乘法
+
+    与逐条调用 compute_embedding_similarity 结果一致（取不到 embedding 的文本同样降级到Jaccard）。
+    """
+    query = get_embedding(text)
+    if query is None:
+        tokens = frozenset(text.lower().split())
+        return [jaccard_similarity_with_tokens(tokens, t) for t in texts]
+
+    embeddings = [get_embedding(t) for t in texts]
+    sims = [0.0] * len(texts)
+    rows = [i for i, emb in enumerate(embeddings) if emb is not None]
+    if rows:
+        query = np.asarray(query, dtype=np.float64)
+        matrix = np.asarray([embeddings[i] for i in rows], dtype=np.float64)
+        cosine = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+        for i, sim in zip(rows, cosine.tolist()):
+            sims[i] = sim
+    if len(rows) < len(texts):
+        tokens = frozenset(text.lower().split())
+        for i, emb in enumerate(embeddings):
+            if emb is None:
+                sims[i] = jaccard_similarity_with_tokens(tokens, texts[i])
+    return sims
+
 _embedding_cache = {}
 _embedding_warning_shown = False
 _embedding_error_shown = False
@@ -125,7 +181,7 @@ def get_embedding(text, max_retries=3):
 
     for attempt in range(max_retries):
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=10)
+            response = get_http_session().post(url, headers=headers, json=payload, timeout=10)
             response.raise_for_status()
             result = response.json()
             embedding = result['data'][0]['embedding']
@@ -143,6 +199,26 @@ def get_embedding(text, max_retries=3):
     return None
 
 
+def top_k_above(scores, k, threshold):
+    """从 scores 中选出大于 threshold 的 Top-K，按得分降序返回 [(下标, 得分), ...] 及超过阈值的总数
+
+    用 np.argpartition 做 O(N) 选择后只对 K 个元素排序；得分并列时保留靠前的下标，
+    结果与 sorted(..., reverse=True)[:k] 完全一致。
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    idx = np.flatnonzero(scores > threshold)
+    vals = scores[idx]
+    total = len(idx)
+    if total > k:
+        # 第 K 大的得分；严格大于它的全部保留，等于它的按原顺序补足 K 个
+        kth = vals[np.argpartition(-vals, k - 1)[k - 1]]
+        above = np.flatnonzero(vals > kth)
+        ties = np.flatnonzero(vals == kth)[:k - len(above)]
+        keep = np.concatenate([above, ties])
+        idx, vals = idx[keep], vals[keep]
+    order = np.lexsort((idx, -vals))
+    return [(int(i), float(v)) for i, v in zip(idx[order], vals[order])], total
+
 def get_paper_quality(paper):
     """计算Paper的综合质量分数
 
@@ -178,9 +254,8 @@ def get_paper_quality(paper):
     if not scores:
         return 0.5
 
-    # 计算平均分并归一化
-    import numpy as np
-    avg_score = np.mean(scores)
+    # 计算平均分并归一化（列表很短，直接 sum/len，省去构造 ndarray）
+    avg_score = sum(scores) / len(scores)
     # 假设评分范围是 1-10，归一化到 [0, 1]
     normalized_score = (avg_score - 1) / 9
 
@@ -203,16 +278,7 @@ def main():
 
     # 加载数据
     print("📂 加载数据...")
-    with open(NODES_IDEA, 'r', encoding='utf-8') as f:
-        ideas = json.load(f)
-    with open(NODES_PATTERN, 'r', encoding='utf-8') as f:
-        patterns = json.load(f)
-    with open(NODES_DOMAIN, 'r', encoding='utf-8') as f:
-        domains = json.load(f)
-    with open(NODES_PAPER, 'r', encoding='utf-8') as f:
-        papers = json.load(f)
-    with open(GRAPH_FILE, 'rb') as f:
-        G = pickle.load(f)
+    ideas, patterns, domains, papers, (G, num_nodes, num_edges) = _load_all(_data_signature())
 
     # 构建索引
     idea_map = {i['idea_id']: i for i in ideas}
@@ -221,7 +287,10 @@ def main():
     paper_map = {p['paper_id']: p for p in papers}
 
     print(f"  ✓ Idea: {len(ideas)}, Pattern: {len(patterns)}, Domain: {len(domains)}, Paper: {len(papers)}")
-    print(f"  ✓ 图谱: {G.number_of_nodes()} 节点, {G.number_of_edges()} 边\n")
+    print(f"  ✓ 图谱: {num_nodes} 节点, {num_edges} 边\n")
+
+    # 用户 Idea 在各路粗排中保持不变，只分词一次
+    user_tokens = frozenset(user_idea.lower().split())
 
     # ===================== 路径1: 相似Idea召回 =====================
     print("🔍 [路径1] 相似Idea召回...")
@@ -229,39 +298,28 @@ def main():
     # 两阶段召回优化
     if TWO_STAGE_RECALL and USE_EMBEDDING:
         print(f"  [粗排] 使用Jaccard快速筛选Top-{COARSE_RECALL_SIZE}...")
-        coarse_similarities = []
-        for idea in ideas:
-            sim = compute_jaccard_similarity(user_idea, idea['description'])
-            if sim > 0:
-                coarse_similarities.append((idea['idea_id'], sim))
-
-        coarse_similarities.sort(key=lambda x: x[1], reverse=True)
-        candidates = coarse_similarities[:COARSE_RECALL_SIZE]
+        coarse_sims = [jaccard_similarity_with_tokens(user_tokens, idea['description']) for idea in ideas]
+        coarse_top, coarse_count = top_k_above(coarse_sims, COARSE_RECALL_SIZE, 0)
+        candidates = [(ideas[i]['idea_id'], sim) for i, sim in coarse_top]
 
         print(f"  [精排] 使用Embedding重排Top-{TOP_K_IDEAS}...")
         fine_similarities = []
-        for idea_id, _ in candidates:
-            idea = idea_map[idea_id]
-            sim = compute_embedding_similarity(user_idea, idea['description'])
+        candidate_sims = compute_embedding_similarities(
+            user_idea, [idea_map[idea_id]['description'] for idea_id, _ in candidates])
+        for (idea_id, _), sim in zip(candidates, candidate_sims):
             if sim > 0:
                 fine_similarities.append((idea_id, sim))
 
-        fine_similarities.sort(key=lambda x: x[1], reverse=True)
-        top_ideas = fine_similarities[:TOP_K_IDEAS]
+        top_ideas = heapq.nlargest(TOP_K_IDEAS, fine_similarities, key=lambda x: x[1])
 
-        print(f"  ✓ 粗排{len(coarse_similarities)}个 → 精排{len(candidates)}个 → 最终{len(top_ideas)}个")
+        print(f"  ✓ 粗排{coarse_count}个 → 精排{len(candidates)}个 → 最终{len(top_ideas)}个")
     else:
         # 单阶段召回（原逻辑）
-        similarities = []
-        for idea in ideas:
-            sim = compute_similarity(user_idea, idea['description'])
-            if sim > 0:
-                similarities.append((idea['idea_id'], sim))
-
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        top_ideas = similarities[:TOP_K_IDEAS]
+        idea_sims = compute_similarities(user_idea, [idea['description'] for idea in ideas])
+        top, similar_count = top_k_above(idea_sims, TOP_K_IDEAS, 0)
+        top_ideas = [(ideas[i]['idea_id'], sim) for i, sim in top]
 
-        print(f"  找到 {len(similarities)} 个相似Idea，选择 Top-{TOP_K_IDEAS}")
+        print(f"  找到 {similar_count} 个相似Idea，选择 Top-{TOP_K_IDEAS}")
 
     path1_scores = defaultdict(float)
     for idea_id, similarity in top_ideas:
@@ -275,11 +333,11 @@ def main():
         for pid in pattern_ids:
             path1_scores[pid] += similarity
 
-    # 排序并只保留Top-K个Pattern
-    sorted_path1 = sorted(path1_scores.items(), key=lambda x: x[1], reverse=True)
-    path1_scores = dict(sorted_path1[:TOP_K_PATTERNS_PATH1])
+    # 只保留Top-K个Pattern（heapq.nlargest 与 sorted(..., reverse=True)[:K] 结果及并列顺序一致，无需全量排序）
+    recalled_count = len(path1_scores)
+    path1_scores = dict(heapq.nlargest(TOP_K_PATTERNS_PATH1, path1_scores.items(), key=lambda x: x[1]))
 
-    print(f"  ✓ 召回 {len(sorted_path1)} 个Pattern，保留Top-{TOP_K_PATTERNS_PATH1}\n")
+    print(f"  ✓ 召回 {recalled_count} 个Pattern，保留Top-{TOP_K_PATTERNS_PATH1}\n")
 
     # ===================== 路径2: 领域相关召回 =====================
     print("🌍 [路径2] 领域相关性召回...")
@@ -289,15 +347,13 @@ def main():
     domain_scores = []
 
     if top_idea and G.has_node(top_idea['idea_id']):
-        for successor in G.successors(top_idea['idea_id']):
-            edge_data = G[top_idea['idea_id']][successor]
+        for successor, edge_data in G.succ[top_idea['idea_id']].items():
             if edge_data.get('relation') == 'belongs_to':
                 domain_id = successor
                 weight = edge_data.get('weight', 0.5)
                 domain_scores.append((domain_id, weight))
 
-    domain_scores.sort(key=lambda x: x[1], reverse=True)
-    top_domains = domain_scores[:TOP_K_DOMAINS]
+    top_domains = heapq.nlargest(TOP_K_DOMAINS, domain_scores, key=lambda x: x[1])
 
     print(f"  找到 {len(domain_scores)} 个相关Domain，选择 Top-{TOP_K_DOMAINS}")
 
@@ -317,19 +373,19 @@ def main():
             if sub_domain_str:
                 print(f"    子领域: {sub_domain_str}")
 
-        for predecessor in G.predecessors(domain_id):
-            edge_data = G[predecessor][domain_id]
+        # 直接遍历邻接字典，边属性随邻居一并取出（Domain 的入边上万条，避免逐条 G[u][v] 二次查找）
+        for predecessor, edge_data in G.pred[domain_id].items():
             if edge_data.get('relation') == 'works_well_in':
                 pattern_id = predecessor
                 effectiveness = edge_data.get('effectiveness', 0.0)
                 confidence = edge_data.get('confidence', 0.0)
                 path2_scores[pattern_id] += domain_weight * max(effectiveness, 0.1) * confidence
 
-    # 排序并只保留Top-K个Pattern
-    sorted_path2 = sorted(path2_scores.items(), key=lambda x: x[1], reverse=True)
-    path2_scores = dict(sorted_path2[:TOP_K_PATTERNS_PATH2])
+    # 只保留Top-K个Pattern
+    recalled_count = len(path2_scores)
+    path2_scores = dict(heapq.nlargest(TOP_K_PATTERNS_PATH2, path2_scores.items(), key=lambda x: x[1]))
 
-    print(f"  ✓ 召回 {len(sorted_path2)} 个Pattern，保留Top-{TOP_K_PATTERNS_PATH2}\n")
+    print(f"  ✓ 召回 {recalled_count} 个Pattern，保留Top-{TOP_K_PATTERNS_PATH2}\n")
 
     # ===================== 路径3: 相似Paper召回 =====================
     print("📄 [路径3] 相似Paper召回...")
@@ -337,53 +393,37 @@ def main():
     # 两阶段召回优化
     if TWO_STAGE_RECALL and USE_EMBEDDING:
         print(f"  [粗排] 使用Jaccard快速筛选Top-{COARSE_RECALL_SIZE}...")
-        coarse_similarities = []
-        for paper in papers:
-            paper_title = paper.get('title', '')
-            if not paper_title:
-                continue
-
-            sim = compute_jaccard_similarity(user_idea, paper_title)
-            if sim > 0.05:  # 降低阈值
-                coarse_similarities.append((paper['paper_id'], sim))
-
-        coarse_similarities.sort(key=lambda x: x[1], reverse=True)
-        candidates = coarse_similarities[:COARSE_RECALL_SIZE]
+        titled_papers = [paper for paper in papers if paper.get('title', '')]
+        coarse_sims = [jaccard_similarity_with_tokens(user_tokens, paper['title']) for paper in titled_papers]
+        coarse_top, coarse_count = top_k_above(coarse_sims, COARSE_RECALL_SIZE, 0.05)  # 降低阈值
+        candidates = [(titled_papers[i]['paper_id'], sim) for i, sim in coarse_top]
 
         print(f"  [精排] 使用Embedding重排Top-{TOP_K_PAPERS}...")
         fine_similarities = []
-        for paper_id, _ in candidates:
-            paper = paper_map.get(paper_id)
-            if not paper:
-                continue
-            paper_title = paper.get('title', '')
-
-            sim = compute_embedding_similarity(user_idea, paper_title)
+        candidate_papers = [(paper_id, paper_map[paper_id]) for paper_id, _ in candidates if paper_map.get(paper_id)]
+        candidate_sims = compute_embedding_similarities(
+            user_idea, [paper.get('title', '') for _, paper in candidate_papers])
+        for (paper_id, paper), sim in zip(candidate_papers, candidate_sims):
             if sim > 0.1 and G.has_node(paper_id):
                 quality = get_paper_quality(paper)
                 combined = sim * quality
                 fine_similarities.append((paper_id, sim, quality, combined))
 
-        fine_similarities.sort(key=lambda x: x[3], reverse=True)
-        top_papers = fine_similarities[:TOP_K_PAPERS]
+        top_papers = heapq.nlargest(TOP_K_PAPERS, fine_similarities, key=lambda x: x[3])
 
-        print(f"  ✓ 粗排{len(coarse_similarities)}个 → 精排{len(candidates)}个 → 最终{len(top_papers)}个")
+        print(f"  ✓ 粗排{coarse_count}个 → 精排{len(candidates)}个 → 最终{len(top_papers)}个")
     else:
         # 单阶段召回（原逻辑）
         similarities = []
-        for paper in papers:
-            paper_title = paper.get('title', '')
-            if not paper_title:
-                continue
-
-            sim = compute_similarity(user_idea, paper_title)
+        titled_papers = [paper for paper in papers if paper.get('title', '')]
+        paper_sims = compute_similarities(user_idea, [paper['title'] for paper in titled_papers])
+        for paper, sim in zip(titled_papers, paper_sims):
             if sim > 0.1 and G.has_node(paper['paper_id']):
                 quality = get_paper_quality(paper)
                 combined = sim * quality
                 similarities.append((paper['paper_id'], sim, quality, combined))
 
-        similarities.sort(key=lambda x: x[3], reverse=True)
-        top_papers = similarities[:TOP_K_PAPERS]
+        top_papers = heapq.nlargest(TOP_K_PAPERS, similarities, key=lambda x: x[3])
 
         print(f"  找到 {len(similarities)} 个相似Paper，选择 Top-{TOP_K_PAPERS}")
 
@@ -403,54 +443,53 @@ def main():
 
         if not G.has_node(paper_id):
             continue
-        for successor in G.successors(paper_id):
-            edge_data = G[paper_id][successor]
+        for successor, edge_data in G.succ[paper_id].items():
             if edge_data.get('relation') == 'uses_pattern':
                 pattern_id = successor
                 pattern_quality = edge_data.get('quality', 0.5)
                 path3_scores[pattern_id] += combined_weight * pattern_quality
 
-    # 排序并只保留Top-K个Pattern
-    sorted_path3 = sorted(path3_scores.items(), key=lambda x: x[1], reverse=True)
-    path3_scores = dict(sorted_path3[:TOP_K_PATTERNS_PATH3])
+    # 只保留Top-K个Pattern
+    recalled_count = len(path3_scores)
+    path3_scores = dict(heapq.nlargest(TOP_K_PATTERNS_PATH3, path3_scores.items(), key=lambda x: x[1]))
 
-    print(f"  ✓ 召回 {len(sorted_path3)} 个Pattern，保留Top-{TOP_K_PATTERNS_PATH3}\n")
+    print(f"  ✓ 召回 {recalled_count} 个Pattern，保留Top-{TOP_K_PATTERNS_PATH3}\n")
 
     # ===================== 融合结果 =====================
     print("🔗 融合三路召回结果...\n")
 
-    all_patterns = set(path1_scores.keys()) | set(path2_scores.keys()) | set(path3_scores.keys())
-
+    contributions = path_contributions(path1_scores, path2_scores, path3_scores,
+                                       weights=(PATH1_WEIGHT, PATH2_WEIGHT, PATH3_WEIGHT))
     final_scores = {}
-    for pattern_id in all_patterns:
-        score1 = path1_scores.get(pattern_id, 0.0) * PATH1_WEIGHT
-        score2 = path2_scores.get(pattern_id, 0.0) * PATH2_WEIGHT
-        score3 = path3_scores.get(pattern_id, 0.0) * PATH3_WEIGHT
-        final_scores[pattern_id] = score1 + score2 + score3
+    for path_contribution in contributions:
+        for pattern_id, score in path_contribution.items():
+            final_scores[pattern_id] = final_scores.get(pattern_id, 0.0) + score
 
-    ranked = sorted(final_scores.items(), key=lambda x: x[1], reverse=True)
-    top_k = ranked[:FINAL_TOP_K]
+    top_k = heapq.nlargest(FINAL_TOP_K, final_scores.items(), key=lambda x: x[1])
 
     # ===================== 输出结果 =====================
     print("=" * 80)
     print(f"📊 召回结果 Top-{FINAL_TOP_K}")
     print("=" * 80)
 
+    # 各路得分矩阵 (3, K) 及占比一次性批量计算，最终得分为 0 时占比记为 0
+    path_scores = np.array([[path.get(pattern_id, 0.0) for pattern_id, _ in top_k]
+                            for path in contributions]).reshape(len(contributions), len(top_k))
+    totals = np.array([final_score for _, final_score in top_k])
+    pcts = path_scores / np.where(totals == 0, 1.0, totals) * 100
+
     for rank, (pattern_id, final_score) in enumerate(top_k, 1):
         pattern_info = pattern_map.get(pattern_id, {})
 
-        score1 = path1_scores.get(pattern_id, 0.0) * PATH1_WEIGHT
-        score2 = path2_scores.get(pattern_id, 0.0) * PATH2_WEIGHT
-        score3 = path3_scores.get(pattern_id, 0.0) * PATH3_WEIGHT
+        (score1, score2, score3), (pct1, pct2, pct3) = path_scores[:, rank - 1], pcts[:, rank - 1]
 
         print(f"\n【Rank {rank}】 {pattern_id}")
         print(f"  名称: {pattern_info.get('name', 'N/A')}")
         print(f"  最终得分: {final_score:.4f}")
 
-        if final_score > 0:
-            print(f"  - 路径1 (相似Idea):   {score1:.4f} (占比 {score1/final_score*100:.1f}%)")
-            print(f"  - 路径2 (领域相关):   {score2:.4f} (占比 {score2/final_score*100:.1f}%)")
-            print(f"  - 路径3 (相似Paper):  {score3:.4f} (占比 {score3/final_score*100:.1f}%)")
+        print(f"  - 路径1 (相似Idea):   {score1:.4f} (占比 {pct1:.1f}%)")
+        print(f"  - 路径2 (领域相关):   {score2:.4f} (占比 {pct2:.1f}%)")
+        print(f"  - 路径3 (相似Paper):  {score3:.4f} (占比 {pct3:.1f}%)")
 
         print(f"  聚类大小: {pattern_info.get('size', 0)} 篇论文")
 